@@ -1,92 +1,393 @@
+import argparse
+import copy
+import os
+import random
+import numpy as np
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
-from torchvision import datasets, transforms, models
-from torch.utils.data import DataLoader
+from PIL import Image
+from torchvision import datasets, transforms
+from torch.utils.data import ConcatDataset, DataLoader, Dataset, Subset
+
+from cache_dataset import DatasetMaterializado, extraer_features, materializar_dataset, normalizar_lote
+from deduplicar_dataset import indices_manifiesto
+from modelos import BACKBONES, cargar_checkpoint, crear_backbone, guardar_checkpoint, medir_fps, obtener_cabeza
+from utilidades_imagenes import listar_imagenes
 
 # 1. Definir las transformaciones para las imágenes
-data_transform = transforms.Compose([
+# La parte determinista (Resize/CenterCrop) puede materializarse una vez en disco
+pre_transform = transforms.Compose([
     transforms.Resize(256),
     transforms.CenterCrop(224),
+])
+data_transform = transforms.Compose([
+    pre_transform,
     transforms.ToTensor(),
     transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
 ])
 
-# 2. Cargar el dataset desde la carpeta raíz que contiene las dos clases
 data_dir = '/home/daniel/Escritorio/Programación de IA/Proyecto/accidentes'  # Esta carpeta contiene los directorios "con_sancion" y "sin_sancion"
-dataset = datasets.ImageFolder(root=data_dir, transform=data_transform)
+batch_size = 50
+num_epochs = 30
 
-# Verificar las clases detectadas automáticamente
-print("Clases:", dataset.classes)  # Ejemplo: ['con_sancion', 'sin_sancion']
+def crear_modelo(arquitectura="resnet152"):
+    """Backbone preentrenado y congelado con una capa final de 2 clases"""
+    return crear_backbone(arquitectura, num_clases=2, preentrenado=True, congelar=True)
 
-# 3. Crear un DataLoader
-batch_size = 50
-dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True, num_workers=4)
+def dividir_estratificado(targets, fraccion_val, semilla=42):
+    """Reparte los índices en train/val manteniendo la proporción de cada clase"""
+    rng = random.Random(semilla)
+    por_clase = {}
+    for i, label in enumerate(targets):
+        por_clase.setdefault(int(label), []).append(i)
 
-# 4. Cargar un modelo preentrenado (por ejemplo, ResNet18)
-model = models.resnet152(pretrained=True)
+    train_idx, val_idx = [], []
+    for indices in por_clase.values():
+        rng.shuffle(indices)
+        n_val = int(round(len(indices) * fraccion_val))
+        val_idx.extend(indices[:n_val])
+        train_idx.extend(indices[n_val:])
+    return sorted(train_idx), sorted(val_idx)
 
-# Congelar los parámetros de todas las capas (opcional)
-for param in model.parameters():
-    param.requires_grad = False
+class Metricas:
+    """
+    Acumula la matriz de confusión y la pérdida en el dispositivo durante la época.
+    Solo se sincroniza con la CPU una vez, al pedir el resumen.
+    """
 
-# 5. Modificar la capa final para adaptarla a 2 clases
-num_ftrs = model.fc.in_features
-model.fc = nn.Linear(num_ftrs, 2)
+    def __init__(self, num_clases, device):
+        self.num_clases = num_clases
+        self.confusion = torch.zeros(num_clases * num_clases, dtype=torch.long, device=device)
+        self.loss = torch.zeros((), device=device)
 
-# 6. Configurar dispositivo, función de pérdida y optimizador
-device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.SGD(model.fc.parameters(), lr=0.001, momentum=0.9)
+    def actualizar(self, outputs, labels, loss):
+        preds = outputs.argmax(1)
+        self.confusion += torch.bincount(labels * self.num_clases + preds, minlength=self.num_clases ** 2)
+        self.loss += loss.detach() * labels.size(0)
 
-# 7. Bucle de entrenamiento
-num_epochs = 30
-total_loss = 0.0
-total_corrects = 0
+    def resumen(self):
+        confusion = self.confusion.view(self.num_clases, self.num_clases).cpu().double()
+        total = confusion.sum().item()
+        aciertos = confusion.diag()
+        return {
+            "loss": self.loss.item() / total if total else 0.0,
+            "accuracy": aciertos.sum().item() / total if total else 0.0,
+            "precision": (aciertos / confusion.sum(0).clamp(min=1)).tolist(),
+            "recall": (aciertos / confusion.sum(1).clamp(min=1)).tolist(),
+            "confusion": confusion.long().tolist(),
+        }
+
+def formatear(metricas, clases, prefijo=""):
+    texto = f"{prefijo}Loss: {metricas['loss']:.4f} - {prefijo}Accuracy: {metricas['accuracy']:.4f}"
+    # Precision/recall de la clase de interés (la primera: con_sancion)
+    return texto + f" - P({clases[0]}): {metricas['precision'][0]:.3f} - R({clases[0]}): {metricas['recall'][0]:.3f}"
+
+def crear_dataloader(dataset, shuffle):
+    """Un dataset materializado solo copia memoria, así que no necesita procesos auxiliares"""
+    base = dataset.dataset if isinstance(dataset, Subset) else dataset
+    num_workers = 0 if isinstance(base, DatasetMaterializado) else 4
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers)
+
+def entrenar(model, red, lotes_train, lotes_val, device, num_epochs, clases, paciencia, salida, arquitectura):
+    """
+    Bucle común: entrena `red` (el modelo completo o solo la capa final), evalúa en
+    validación al final de cada época, guarda el mejor checkpoint de `model` y se
+    detiene si la pérdida de validación no mejora en `paciencia` épocas.
+    """
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.SGD(obtener_cabeza(model).parameters(), lr=0.001, momentum=0.9)
+    mejor_loss = float("inf")
+    mejor_estado = None
+    sin_mejora = 0
+    historial = []
+
+    for epoch in range(num_epochs):
+        red.train()  # Modo entrenamiento
+        metricas_train = Metricas(len(clases), device)
+        for inputs, labels in lotes_train():
+            optimizer.zero_grad()
+            outputs = red(inputs)
+            loss = criterion(outputs, labels)
+            loss.backward()
+            optimizer.step()
+            metricas_train.actualizar(outputs, labels, loss)
+        train = metricas_train.resumen()
+
+        linea = f'Época {epoch+1}/{num_epochs} - {formatear(train, clases)}'
+        val = None
+        if lotes_val is not None:
+            red.eval()
+            metricas_val = Metricas(len(clases), device)
+            with torch.no_grad():
+                for inputs, labels in lotes_val():
+                    outputs = red(inputs)
+                    metricas_val.actualizar(outputs, labels, criterion(outputs, labels))
+            val = metricas_val.resumen()
+            linea += f' | {formatear(val, clases, "Val ")}'
+        print(linea)
+        historial.append({"train": train, "val": val})
+
+        # Sin validación se conserva el comportamiento anterior: el modelo de la última época
+        if val is None or val["loss"] < mejor_loss:
+            mejor_loss = val["loss"] if val is not None else mejor_loss
+            mejor_estado = copy.deepcopy(model.state_dict())
+            sin_mejora = 0
+            guardar_checkpoint(mejor_estado, arquitectura, salida, clases)
+        else:
+            sin_mejora += 1
+            if sin_mejora >= paciencia:
+                print(f"Parada temprana: la pérdida de validación no mejora desde hace {paciencia} épocas")
+                break
+
+    model.load_state_dict(mejor_estado)
+    return historial
+
+def lotes_dataloader(dataset, indices, shuffle, device):
+    """Genera lotes (inputs, labels) ya en el dispositivo a partir de un dataset de imágenes"""
+    loader = crear_dataloader(Subset(dataset, indices), shuffle)
+
+    def lotes():
+        for inputs, labels in loader:
+            yield normalizar_lote(inputs, device), labels.to(device)
+    return lotes
+
+def lotes_features(X, y, shuffle):
+    """Genera lotes sobre características ya cargadas en el dispositivo"""
+    def lotes():
+        orden = torch.randperm(len(y), device=y.device) if shuffle else torch.arange(len(y), device=y.device)
+        for idx in orden.split(batch_size):
+            yield X[idx], y[idx]
+    return lotes
+
+# ---------------------------------------------------
+# Destilación: un alumno pequeño aprende de los logits del modelo ResNet-152
+# ---------------------------------------------------
+
+# Backbone del alumno si no se indica --arquitectura (el profesor es ResNet-152)
+ALUMNO_DEFECTO = "mobilenet_v3_large"
+
+class ImagenesSinEtiqueta(Dataset):
+    """Imágenes sueltas de una carpeta (p. ej. frames/) sin etiqueta: el target es -1"""
+
+    def __init__(self, carpeta, uint8=False):
+        self.rutas = listar_imagenes(carpeta)
+        # Con un dataset materializado los lotes van en uint8 y se normalizan en el dispositivo
+        self.uint8 = uint8
+
+    def __len__(self):
+        return len(self.rutas)
+
+    def __getitem__(self, i):
+        img = Image.open(self.rutas[i]).convert("RGB")
+        if self.uint8:
+            return torch.from_numpy(np.asarray(pre_transform(img), dtype=np.uint8).transpose(2, 0, 1).copy()), -1
+        return data_transform(img), -1
 
-def calcular_accuracy(model, dataloader, device):
+class ConIndice(Dataset):
+    """Añade el índice de la muestra para buscar sus logits del profesor ya calculados"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, i):
+        inputs, label = self.dataset[i]
+        return inputs, label, i
+
+def calcular_logits(model, dataset, device):
+    """Una sola pasada del profesor: sus logits se reutilizan en todas las épocas"""
     model.eval()
-    corrects = 0
-    total = 0
-    with torch.no_grad():
-        for inputs, labels in dataloader:
-            inputs = inputs.to(device)
+    logits = []
+    with torch.inference_mode():
+        for inputs, _ in crear_dataloader(dataset, shuffle=False):
+            logits.append(model(normalizar_lote(inputs, device)))
+    return torch.cat(logits)
+
+def destilar(profesor, alumno, dataset_train, dataset_val, device, num_epochs, clases,
+             temperatura, alpha, paciencia, salida, arquitectura):
+    """
+    Entrena `alumno` con KL(alumno/T || profesor/T)·T² y, en las muestras etiquetadas,
+    con entropía cruzada (peso 1 - alpha). Guarda el alumno con mayor concordancia
+    con los veredictos del profesor en validación.
+    """
+    print("Calculando logits del profesor...")
+    logits_train = calcular_logits(profesor, dataset_train, device)
+    logits_val = calcular_logits(profesor, dataset_val, device) if len(dataset_val) else None
+
+    loader = crear_dataloader(ConIndice(dataset_train), shuffle=True)
+    optimizer = optim.SGD(alumno.parameters(), lr=0.001, momentum=0.9)
+    mejor_concordancia = -1.0
+    mejor_estado = None
+    sin_mejora = 0
+
+    for epoch in range(num_epochs):
+        alumno.train()
+        suma_loss = torch.zeros((), device=device)
+        n = 0
+        for inputs, labels, idx in loader:
+            inputs = normalizar_lote(inputs, device)
             labels = labels.to(device)
-            outputs = model(inputs)
-            _, preds = torch.max(outputs, 1)
-            corrects += torch.sum(preds == labels.data)
-            total += labels.size(0)
-    return corrects.double() / total
-
-for epoch in range(num_epochs):
-    model.train()  # Modo entrenamiento
-    running_loss = 0.0
-    running_corrects = 0
-    
-    for inputs, labels in dataloader:
-        inputs = inputs.to(device)
-        labels = labels.to(device)
-        
-        optimizer.zero_grad()
-        outputs = model(inputs)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
-        
-        running_loss += loss.item() * inputs.size(0)
-        _, preds = torch.max(outputs, 1)
-        running_corrects += torch.sum(preds == labels.data)
-    
-    epoch_loss = running_loss / len(dataset)
-    epoch_acc = running_corrects.double() / len(dataset)
-    total_loss = epoch_loss
-    total_corrects = epoch_acc
-    print(f'Época {epoch+1}/{num_epochs} - Loss: {epoch_loss:.4f} - Accuracy: {epoch_acc:.4f}')
-
-# Calcular métricas finales
-final_accuracy = calcular_accuracy(model, dataloader, device)
-print(f'Entrenamiento completado - Loss Final: {total_loss:.4f} - Accuracy Final: {final_accuracy:.4f}')
-
-torch.save(model.state_dict(), "StewardBot.pth")
-print("Modelo guardado como 'StewardBot.pth'")
+            objetivo = logits_train[idx.to(device)]
+
+            optimizer.zero_grad()
+            outputs = alumno(inputs)
+            loss_kd = F.kl_div(F.log_softmax(outputs / temperatura, 1), F.softmax(objetivo / temperatura, 1),
+                               reduction="batchmean") * temperatura ** 2
+            # Las imágenes sin etiqueta (-1) solo aportan al término de destilación
+            etiquetadas = (labels >= 0).sum().clamp(min=1)
+            loss_ce = F.cross_entropy(outputs, labels, ignore_index=-1, reduction="sum") / etiquetadas
+            loss = alpha * loss_kd + (1 - alpha) * loss_ce
+            loss.backward()
+            optimizer.step()
+
+            suma_loss += loss.detach() * inputs.size(0)
+            n += inputs.size(0)
+
+        linea = f'Época {epoch+1}/{num_epochs} - Loss destilación: {suma_loss.item() / n:.4f}'
+        concordancia = None
+        if logits_val is not None:
+            alumno.eval()
+            metricas = Metricas(len(clases), device)
+            coincidencias = torch.zeros((), dtype=torch.long, device=device)
+            inicio = 0
+            with torch.no_grad():
+                for inputs, labels in crear_dataloader(dataset_val, shuffle=False):
+                    labels = labels.to(device)
+                    outputs = alumno(normalizar_lote(inputs, device))
+                    fin = inicio + labels.size(0)
+                    coincidencias += (outputs.argmax(1) == logits_val[inicio:fin].argmax(1)).sum()
+                    metricas.actualizar(outputs, labels, F.cross_entropy(outputs, labels))
+                    inicio = fin
+            concordancia = coincidencias.item() / len(dataset_val)
+            linea += f' | {formatear(metricas.resumen(), clases, "Val ")} - Concordancia con profesor: {concordancia:.4f}'
+        print(linea)
+
+        if concordancia is None or concordancia > mejor_concordancia:
+            mejor_concordancia = concordancia if concordancia is not None else mejor_concordancia
+            mejor_estado = copy.deepcopy(alumno.state_dict())
+            sin_mejora = 0
+            guardar_checkpoint(mejor_estado, arquitectura, salida, clases, temperatura=temperatura)
+        else:
+            sin_mejora += 1
+            if sin_mejora >= paciencia:
+                print(f"Parada temprana: la concordancia no mejora desde hace {paciencia} épocas")
+                break
+
+    alumno.load_state_dict(mejor_estado)
+    return mejor_concordancia
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrenamiento del clasificador StewardBot")
+    parser.add_argument("--data-dir", default=data_dir)
+    parser.add_argument("--epochs", type=int, default=num_epochs)
+    parser.add_argument("--modo", choices=["completo", "features", "destilacion"], default="completo",
+                        help="'features' extrae una vez las características del backbone y entrena solo la capa final; "
+                             "'destilacion' entrena un alumno (--arquitectura) con los logits de --profesor")
+    parser.add_argument("--arquitectura", choices=list(BACKBONES), default=None,
+                        help=f"backbone a entrenar (por defecto resnet152, o {ALUMNO_DEFECTO} como alumno al destilar)")
+    parser.add_argument("--cache-dir", default="cache_features")
+    parser.add_argument("--materializar", action="store_true",
+                        help="decodifica y recorta las imágenes una vez en un shard uint8 memory-mapped")
+    parser.add_argument("--materializado-dir", default="cache_dataset")
+    parser.add_argument("--val", type=float, default=0.2, help="fracción estratificada para validación (0 la desactiva)")
+    parser.add_argument("--paciencia", type=int, default=5, help="épocas sin mejora antes de la parada temprana")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--manifiesto", default=None,
+                        help="manifiesto de deduplicar_dataset.py: solo se usan las imágenes que conserva")
+    parser.add_argument("--salida", default=None,
+                        help="checkpoint de salida (por defecto StewardBot.pth, o StewardBot_alumno.pth al destilar)")
+    parser.add_argument("--profesor", default="StewardBot.pth", help="checkpoint del profesor para la destilación")
+    parser.add_argument("--sin-etiqueta", default="frames", help="carpeta de imágenes sin etiquetar para la destilación")
+    parser.add_argument("--temperatura", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.7, help="peso del término de destilación frente al de etiquetas")
+    parser.add_argument("--tolerancia", type=float, default=0.02,
+                        help="discrepancia máxima aceptada entre alumno y profesor en validación")
+    args = parser.parse_args()
+    if args.salida is None:
+        args.salida = "StewardBot_alumno.pth" if args.modo == "destilacion" else "StewardBot.pth"
+    if args.arquitectura is None:
+        args.arquitectura = ALUMNO_DEFECTO if args.modo == "destilacion" else "resnet152"
+
+    # 2. Cargar el dataset desde la carpeta raíz que contiene las dos clases
+    dataset = datasets.ImageFolder(root=args.data_dir, transform=data_transform)
+    if args.materializar:
+        dataset = materializar_dataset(dataset, pre_transform, args.materializado_dir)
+
+    # Verificar las clases detectadas automáticamente
+    print("Clases:", dataset.classes)  # Ejemplo: ['con_sancion', 'sin_sancion']
+
+    # 3. Separar train/val de forma estratificada (sin duplicados si hay manifiesto,
+    # para que una ráfaga de frames casi idénticos no quede a ambos lados del split)
+    indices = list(range(len(dataset)))
+    if args.manifiesto:
+        try:
+            indices = indices_manifiesto(dataset, args.manifiesto)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Manifiesto: se conservan {len(indices)} de {len(dataset)} imágenes")
+    train_pos, val_pos = dividir_estratificado([dataset.targets[i] for i in indices], args.val, args.semilla)
+    train_idx = [indices[i] for i in train_pos]
+    val_idx = [indices[i] for i in val_pos]
+    print(f"Train: {len(train_idx)} imágenes - Val: {len(val_idx)} imágenes")
+
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+
+    if args.modo == "destilacion":
+        profesor, meta = cargar_checkpoint(args.profesor, device)
+        if args.arquitectura == meta["arquitectura"]:
+            parser.error(f"el alumno ({args.arquitectura}) debe ser un backbone más pequeño que el profesor")
+        alumno = crear_backbone(args.arquitectura, num_clases=len(dataset.classes), preentrenado=True).to(device)
+        print(f"Profesor: {meta['arquitectura']} - Alumno: {args.arquitectura}")
+
+        dataset_train = Subset(dataset, train_idx)
+        if args.sin_etiqueta and os.path.isdir(args.sin_etiqueta):
+            sin_etiqueta = ImagenesSinEtiqueta(args.sin_etiqueta, uint8=isinstance(dataset, DatasetMaterializado))
+            print(f"Imágenes sin etiquetar: {len(sin_etiqueta)}")
+            dataset_train = ConcatDataset([dataset_train, sin_etiqueta])
+
+        concordancia = destilar(profesor, alumno, dataset_train, Subset(dataset, val_idx), device, args.epochs,
+                                dataset.classes, args.temperatura, args.alpha, args.paciencia,
+                                args.salida, args.arquitectura)
+
+        fps_profesor = medir_fps(profesor, device, batch_size=1)
+        fps_alumno = medir_fps(alumno, device, batch_size=1)
+        print(f"Velocidad: profesor {fps_profesor:.1f} FPS - alumno {fps_alumno:.1f} FPS "
+              f"({fps_alumno / fps_profesor:.1f}x)")
+        if concordancia >= 0:
+            estado = "dentro de" if 1 - concordancia <= args.tolerancia else "FUERA de"
+            print(f"Concordancia con el profesor: {concordancia:.4f} ({estado} la tolerancia de {args.tolerancia:.2%})")
+        print(f"Alumno guardado como '{args.salida}' (usar con STEWARDBOT_MODELO={args.salida})")
+    else:
+        # 4. Cargar un modelo preentrenado
+        model = crear_modelo(args.arquitectura)
+        model = model.to(device)
+
+        # 5. Bucle de entrenamiento
+        if args.modo == "features":
+            num_workers = 0 if isinstance(dataset, DatasetMaterializado) else 4
+            features, labels = extraer_features(model, dataset, args.cache_dir, device, batch_size,
+                                                num_workers, clave_extra=args.arquitectura)
+            X = torch.from_numpy(features[:]).to(device)
+            y = torch.from_numpy(labels[:]).to(device)
+            train_t = torch.tensor(train_idx, device=device)
+            val_t = torch.tensor(val_idx, device=device)
+            red = obtener_cabeza(model)
+            lotes_train = lotes_features(X[train_t], y[train_t], shuffle=True)
+            lotes_val = lotes_features(X[val_t], y[val_t], shuffle=False) if val_idx else None
+        else:
+            red = model
+            lotes_train = lotes_dataloader(dataset, train_idx, True, device)
+            lotes_val = lotes_dataloader(dataset, val_idx, False, device) if val_idx else None
+
+        historial = entrenar(model, red, lotes_train, lotes_val, device, args.epochs,
+                             dataset.classes, args.paciencia, args.salida, args.arquitectura)
+
+        final = min((h for h in historial if h["val"]), key=lambda h: h["val"]["loss"], default=historial[-1])
+        metricas = final["val"] or final["train"]
+        print(f'Entrenamiento completado - Loss Final: {metricas["loss"]:.4f} - Accuracy Final: {metricas["accuracy"]:.4f}')
+        print("Matriz de confusión (filas = real, columnas = predicción):", metricas["confusion"])
+        print(f"Modelo guardado como '{args.salida}'")
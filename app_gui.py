@@ -4,7 +4,7 @@ from PIL import ImageTk, Image
 import os
 
 # Asegúrate de que estos import sean válidos según cómo tengas dividido tu código
-from app_modelo import clasificar_imagen, analizar_imagen, cargar_sanciones, buscar_sanciones
+from app_modelo import clasificar_imagen, analizar_imagen, obtener_repositorio
 
 
 class App:
@@ -78,8 +78,7 @@ class App:
             descripcion = analizar_imagen(self.ruta_imagen)
             self.descripcion_text.insert(tk.END, descripcion)
 
-            sanciones = cargar_sanciones()
-            resultados = buscar_sanciones(descripcion, sanciones)
+            resultados = obtener_repositorio().buscar(descripcion)
 
             if resultados:
                 mejor = resultados[0]
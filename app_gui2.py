@@ -1,9 +1,19 @@
+import time
+_inicio = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinter import font as tkfont
 from PIL import ImageTk, Image
 import os
-from app_modelo import clasificar_imagen, analizar_imagen, cargar_sanciones, buscar_sanciones
+import math
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from app_modelo import (clasificar_imagen, clasificar_imagenes, analizar_imagen, analizar_imagen_stream,
+                        obtener_repositorio, precargar_modelo)
+from utilidades_imagenes import es_imagen
 
 class ToolTip:
     def __init__(self, widget, text):
@@ -35,6 +45,256 @@ class ToolTip:
         if tw:
             tw.destroy()
 
+class CacheMiniaturas:
+    """LRU de miniaturas ya convertidas a PhotoImage, indexadas por ruta y fecha de modificación"""
+
+    def __init__(self, capacidad=512):
+        self.capacidad = capacidad
+        self._fotos = OrderedDict()
+
+    @staticmethod
+    def clave(ruta):
+        return ruta, os.stat(ruta).st_mtime_ns
+
+    def obtener(self, clave):
+        foto = self._fotos.get(clave)
+        if foto is not None:
+            self._fotos.move_to_end(clave)
+        return foto
+
+    def guardar(self, clave, foto):
+        self._fotos[clave] = foto
+        self._fotos.move_to_end(clave)
+        while len(self._fotos) > self.capacidad:
+            self._fotos.popitem(last=False)
+
+
+def crear_miniatura(ruta, tamano):
+    """Decodifica la imagen a escala reducida y la ajusta al tamaño de la celda (sin Tk, apta para hilos)"""
+    img = Image.open(ruta)
+    # En JPEG, draft() decodifica directamente a 1/2, 1/4 u 1/8 de resolución
+    img.draft('RGB', (tamano, tamano))
+    img = img.convert('RGB')
+    img.thumbnail((tamano, tamano), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return img
+
+
+class RevisionCarpeta:
+    """Ventana de revisión por lotes: cuadrícula virtualizada de miniaturas con su clasificación"""
+
+    MINIATURA = 150
+    CELDA_ANCHO = 170
+    CELDA_ALTO = 200
+    BATCH = 32
+
+    def __init__(self, app, carpeta):
+        self.app = app
+        self.carpeta = carpeta
+        self.rutas = sorted(
+            os.path.join(carpeta, f) for f in os.listdir(carpeta)
+            if es_imagen(f)
+        )
+        self.posiciones = {ruta: i for i, ruta in enumerate(self.rutas)}
+        self.resultados = {}   # ruta -> dict de clasificar_imagenes
+        self.sanciones = {}    # ruta -> penalización recomendada
+        self.celdas = set()    # índices dibujados actualmente
+        self.columnas = 0
+        self.pendientes = set()
+        self.mensajes = queue.Queue()
+        self.detener = threading.Event()
+        self.pool = ThreadPoolExecutor(max_workers=4)
+
+        self.ventana = tk.Toplevel(app.root)
+        self.ventana.title(f"Revisión de carpeta - {os.path.basename(carpeta)}")
+        self.ventana.geometry("900x700")
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+        barra = ttk.Frame(self.ventana, padding=5)
+        barra.pack(fill=tk.X)
+        self.describir_button = ttk.Button(barra, text="🔎 Describir sancionables",
+                                           command=self.describir_sancionables, state="disabled")
+        self.describir_button.pack(side="left", padx=5)
+        ToolTip(self.describir_button, "Envía a LLaVA solo los frames clasificados como sancionables")
+        self.estado = tk.StringVar(value=f"{len(self.rutas)} imágenes - clasificando...")
+        ttk.Label(barra, textvariable=self.estado).pack(side="left", padx=10)
+
+        marco = ttk.Frame(self.ventana)
+        marco.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(marco, background='#f0f0f0', highlightthickness=0)
+        scroll = ttk.Scrollbar(marco, command=self._desplazar)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.config(yscrollcommand=scroll.set)
+
+        self.canvas.bind("<Configure>", lambda e: self.redibujar())
+        self.canvas.bind("<MouseWheel>", lambda e: self._desplazar("scroll", -1 * (e.delta // 120), "units"))
+        self.canvas.bind("<Button-4>", lambda e: self._desplazar("scroll", -1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self._desplazar("scroll", 1, "units"))
+        self.canvas.bind("<Button-1>", self._click)
+
+        threading.Thread(target=self._clasificar, daemon=True).start()
+        self.ventana.after(50, self._procesar_mensajes)
+
+    # --- Trabajo en segundo plano ---
+
+    def _clasificar(self):
+        """Clasifica la carpeta por lotes y publica cada lote en cuanto termina"""
+        try:
+            for i in range(0, len(self.rutas), self.BATCH):
+                if self.detener.is_set():
+                    return
+                lote = clasificar_imagenes(self.rutas[i:i + self.BATCH], batch_size=self.BATCH, omitir_errores=True)
+                self.mensajes.put(("clasificacion", lote))
+            self.mensajes.put(("clasificado", None))
+        except Exception as e:
+            self.mensajes.put(("error", e))
+
+    def _generar_miniatura(self, clave):
+        if self.detener.is_set():
+            return
+        try:
+            self.mensajes.put(("miniatura", (clave, crear_miniatura(clave[0], self.MINIATURA))))
+        except Exception:
+            self.mensajes.put(("miniatura", (clave, None)))
+
+    def _describir(self, rutas):
+        """Solo los frames sancionables pasan por el paso costoso de LLaVA"""
+        repositorio = obtener_repositorio()
+        for n, ruta in enumerate(rutas, start=1):
+            if self.detener.is_set():
+                return
+            try:
+                resultados = repositorio.buscar(analizar_imagen(ruta))
+                penalizacion = resultados[0]["metadata"]["penalizacion"] if resultados else "Sin sanción"
+            except Exception as e:
+                penalizacion = f"Error: {e}"
+            self.mensajes.put(("sancion", (ruta, penalizacion, n, len(rutas))))
+
+    # --- Hilo de Tk ---
+
+    def _procesar_mensajes(self):
+        if self.detener.is_set():
+            return
+        try:
+            while True:
+                tipo, datos = self.mensajes.get_nowait()
+                if tipo == "clasificacion":
+                    for resultado in datos:
+                        self.resultados[resultado["ruta"]] = resultado
+                        self._actualizar_celda(self.posiciones[resultado["ruta"]])
+                    self.estado.set(f"{len(self.resultados)}/{len(self.rutas)} imágenes clasificadas")
+                elif tipo == "clasificado":
+                    sancionables = len(self._sancionables())
+                    errores = sum(1 for r in self.resultados.values() if r["categoria"] is None)
+                    self.estado.set(f"{len(self.rutas)} imágenes - {sancionables} sancionables"
+                                    + (f" - {errores} ilegibles" if errores else ""))
+                    self.describir_button.config(state="normal" if sancionables else "disabled")
+                elif tipo == "miniatura":
+                    clave, img = datos
+                    self.pendientes.discard(clave)
+                    if img is not None:
+                        self.app.miniaturas.guardar(clave, ImageTk.PhotoImage(img))
+                        self._actualizar_celda(self.posiciones[clave[0]])
+                elif tipo == "sancion":
+                    ruta, penalizacion, n, total = datos
+                    self.sanciones[ruta] = penalizacion
+                    self._actualizar_celda(self.posiciones[ruta])
+                    self.estado.set(f"Describiendo sancionables {n}/{total}")
+                elif tipo == "error":
+                    messagebox.showerror("Error", f"Error durante la clasificación:\n{str(datos)}", parent=self.ventana)
+        except queue.Empty:
+            pass
+        self.ventana.after(50, self._procesar_mensajes)
+
+    def _sancionables(self):
+        return [r for r in self.rutas if self.resultados.get(r, {}).get("categoria") == "con_sancion"]
+
+    def describir_sancionables(self):
+        self.describir_button.config(state="disabled")
+        self.pool.submit(self._describir, self._sancionables())
+
+    def _desplazar(self, *args):
+        self.canvas.yview(*args)
+        self.redibujar()
+
+    def _click(self, event):
+        """Abre la imagen pulsada en la ventana principal para su análisis detallado"""
+        col = int(event.x // self.CELDA_ANCHO)
+        fila = int(self.canvas.canvasy(event.y) // self.CELDA_ALTO)
+        i = fila * self.columnas + col
+        if col < self.columnas and 0 <= i < len(self.rutas):
+            self.app.cargar_ruta(self.rutas[i])
+
+    def redibujar(self):
+        """Dibuja solo las celdas visibles; las que salen de la vista se eliminan del canvas"""
+        columnas = max(1, self.canvas.winfo_width() // self.CELDA_ANCHO)
+        if columnas != self.columnas:
+            self.columnas = columnas
+            self.canvas.delete("all")
+            self.celdas.clear()
+        filas = math.ceil(len(self.rutas) / columnas)
+        self.canvas.config(scrollregion=(0, 0, columnas * self.CELDA_ANCHO, filas * self.CELDA_ALTO))
+
+        y0 = self.canvas.canvasy(0)
+        y1 = y0 + self.canvas.winfo_height()
+        primera = int(y0 // self.CELDA_ALTO) * columnas
+        ultima = min(len(self.rutas), (int(y1 // self.CELDA_ALTO) + 1) * columnas)
+        visibles = set(range(primera, ultima))
+
+        for i in self.celdas - visibles:
+            self.canvas.delete(f"celda{i}")
+        for i in visibles - self.celdas:
+            self._dibujar_celda(i)
+        self.celdas = visibles
+
+    def _actualizar_celda(self, i):
+        if i in self.celdas:
+            self.canvas.delete(f"celda{i}")
+            self._dibujar_celda(i)
+
+    def _dibujar_celda(self, i):
+        ruta = self.rutas[i]
+        tag = f"celda{i}"
+        x = (i % self.columnas) * self.CELDA_ANCHO + self.CELDA_ANCHO // 2
+        y = (i // self.columnas) * self.CELDA_ALTO
+        centro = y + 10 + self.MINIATURA // 2
+
+        clave = CacheMiniaturas.clave(ruta)
+        foto = self.app.miniaturas.obtener(clave)
+        if foto is not None:
+            self.canvas.create_image(x, centro, image=foto, tags=tag)
+        else:
+            lado = self.MINIATURA // 2
+            self.canvas.create_rectangle(x - lado, centro - lado, x + lado, centro + lado,
+                                         outline='#bdc3c7', tags=tag)
+            if clave not in self.pendientes:
+                self.pendientes.add(clave)
+                self.pool.submit(self._generar_miniatura, clave)
+
+        self.canvas.create_text(x, y + self.MINIATURA + 22, text=os.path.basename(ruta),
+                                width=self.CELDA_ANCHO - 10, font=('TkDefaultFont', 8), tags=tag)
+
+        resultado = self.resultados.get(ruta)
+        if resultado is not None and resultado["categoria"] is None:
+            # Imagen ilegible: se marca en la celda sin detener el resto de la carpeta
+            self.canvas.create_text(x, y + self.MINIATURA + 42, text="⚠️ No se pudo leer",
+                                    width=self.CELDA_ANCHO - 10, justify="center", fill='#f39c12',
+                                    font=('TkDefaultFont', 8, 'bold'), tags=tag)
+        elif resultado is not None:
+            sancionable = resultado["categoria"] == "con_sancion"
+            texto = f"{'🔴 Sancionable' if sancionable else '✅ Lance'} {resultado['confianza']:.0%}"
+            if ruta in self.sanciones:
+                texto += f"\n{self.sanciones[ruta]}"
+            self.canvas.create_text(x, y + self.MINIATURA + 42, text=texto, justify="center",
+                                    fill='#e74c3c' if sancionable else '#27ae60',
+                                    font=('TkDefaultFont', 8, 'bold'), tags=tag)
+
+    def cerrar(self):
+        self.detener.set()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.ventana.destroy()
+
+
 class App:
     def __init__(self, root):
         self.root = root
@@ -46,6 +306,13 @@ class App:
         self.ruta_imagen = None
         self.dark_mode = False
         
+        # Trabajadores en segundo plano y cola de mensajes hacia el hilo de Tk
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        self.mensajes_ui = queue.Queue()
+        self.analisis_id = 0
+        self.cancelar_evento = None
+        self.miniaturas = CacheMiniaturas()
+        
         # Configurar fuente general
         default_font = tkfont.nametofont("TkDefaultFont")
         default_font.configure(size=10)
@@ -76,10 +343,18 @@ class App:
                                     command=self.cargar_imagen, style='Accent.TButton')
         self.load_button.pack(side="left", padx=5, fill=tk.X, expand=True)
         
+        self.folder_button = ttk.Button(button_frame, text="🗂️ Revisar Carpeta", 
+                                      command=self.revisar_carpeta)
+        self.folder_button.pack(side="left", padx=5, fill=tk.X, expand=True)
+        
         self.analyze_button = ttk.Button(button_frame, text="🔎 Analizar Imagen", 
                                        command=self.analizar_imagen, state="disabled")
         self.analyze_button.pack(side="left", padx=5, fill=tk.X, expand=True)
         
+        self.cancel_button = ttk.Button(button_frame, text="⛔ Cancelar", 
+                                      command=self.cancelar_analisis, state="disabled")
+        self.cancel_button.pack(side="left", padx=5, fill=tk.X, expand=True)
+        
         self.reset_button = ttk.Button(button_frame, text="🔄 Reiniciar", 
                                      command=self.reiniciar_app)
         self.reset_button.pack(side="left", padx=5, fill=tk.X, expand=True)
@@ -91,7 +366,9 @@ class App:
         
         # Tooltips para botones
         ToolTip(self.load_button, "Selecciona una imagen de un incidente en pista")
+        ToolTip(self.folder_button, "Clasifica todas las imágenes de una carpeta")
         ToolTip(self.analyze_button, "Analiza la imagen para detectar posibles infracciones")
+        ToolTip(self.cancel_button, "Cancela el análisis en curso")
         ToolTip(self.reset_button, "Reinicia la aplicación al estado inicial")
         ToolTip(self.theme_button, "Cambiar entre tema claro y oscuro")
         
@@ -145,6 +422,9 @@ class App:
         
         # Barra de progreso (inicialmente oculta)
         self.progress = ttk.Progressbar(root, mode='indeterminate')
+        
+        self.root.after(50, self._procesar_mensajes)
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar)
     
     def configure_styles(self):
         """Configura estilos personalizados para los widgets"""
@@ -188,7 +468,15 @@ class App:
         )
         if not ruta:
             return
+        self.cargar_ruta(ruta)
+
+    def revisar_carpeta(self):
+        carpeta = filedialog.askdirectory(title="Seleccionar carpeta de frames")
+        if carpeta:
+            RevisionCarpeta(self, carpeta)
 
+    def cargar_ruta(self, ruta):
+        """Muestra la imagen indicada en la vista previa y la deja lista para analizar"""
         self.reiniciar_app()
         self.ruta_imagen = ruta
         self.status_var.set(f"Cargando imagen: {os.path.basename(ruta)}")
@@ -227,86 +515,148 @@ class App:
             messagebox.showwarning("Advertencia", "Primero selecciona una imagen.")
             return
 
+        # Cada análisis tiene su id: los mensajes de análisis cancelados se descartan
+        self.cancelar_analisis()
+        self.analisis_id += 1
+        self.cancelar_evento = threading.Event()
+
+        # Mostrar progreso (la barra se anima porque el hilo principal queda libre)
+        self.progress.pack(fill=tk.X)
+        self.progress.start(10)
+        self.analyze_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.status_var.set("Analizando imagen...")
+
+        # Limpiar textos anteriores
+        self.resultado_clasificacion.config(text="")
+        self.descripcion_text.delete("1.0", tk.END)
+        self.sancion_text.delete("1.0", tk.END)
+
+        self.pool.submit(self._trabajo_analisis, self.analisis_id, self.ruta_imagen, self.cancelar_evento)
+
+    def _trabajo_analisis(self, analisis_id, ruta, cancelar):
+        """Se ejecuta en el pool: clasifica, describe y busca sanciones enviando mensajes a la UI"""
+        publicar = lambda tipo, *datos: self.mensajes_ui.put((analisis_id, tipo, datos))
         try:
-            # Mostrar progreso
-            self.progress.pack(fill=tk.X)
-            self.progress.start(10)
-            self.analyze_button.config(state="disabled")
-            self.status_var.set("Analizando imagen...")
-            self.root.update()
-            
-            mensaje_clasificacion, categoria = clasificar_imagen(self.ruta_imagen)
+            mensaje_clasificacion, categoria = clasificar_imagen(ruta)
+            publicar("clasificacion", mensaje_clasificacion, categoria)
+            if categoria == "sin_sancion" or cancelar.is_set():
+                publicar("fin")
+                return
+
+            partes = []
+            for token in analizar_imagen_stream(ruta, cancelar):
+                partes.append(token)
+                publicar("token", token)
+            if cancelar.is_set():
+                return
+
+            publicar("sancion", obtener_repositorio().buscar("".join(partes)))
+        except Exception as e:
+            publicar("error", e)
+
+    def _procesar_mensajes(self):
+        """Aplica en el hilo de Tk los mensajes publicados por los trabajadores"""
+        try:
+            while True:
+                analisis_id, tipo, datos = self.mensajes_ui.get_nowait()
+                if analisis_id == self.analisis_id:
+                    self._aplicar_mensaje(tipo, *datos)
+        except queue.Empty:
+            pass
+        self.root.after(50, self._procesar_mensajes)
+
+    def _aplicar_mensaje(self, tipo, *datos):
+        if tipo == "clasificacion":
+            mensaje_clasificacion, categoria = datos
             self.resultado_clasificacion.config(
                 text=f"📊 Clasificación: {mensaje_clasificacion}",
                 foreground='#e74c3c' if categoria == "con_sancion" else '#27ae60'
             )
-            
-            # Limpiar textos anteriores
-            self.descripcion_text.delete("1.0", tk.END)
-            self.sancion_text.delete("1.0", tk.END)
-            
             if categoria == "sin_sancion":
                 self.descripcion_text.insert(tk.END, "✅ No se requiere análisis adicional.", 'success')
                 self.sancion_text.insert(tk.END, "✅ Ninguna sanción aplicable.", 'success')
                 self.status_var.set("Análisis completado - No se detectaron infracciones")
-                return
-            
-            # Mostrar ventana de carga
-            self.show_loading()
-            
-            descripcion = analizar_imagen(self.ruta_imagen)
-            self.descripcion_text.insert(tk.END, descripcion)
-            
-            sanciones = cargar_sanciones()
-            resultados = buscar_sanciones(descripcion, sanciones)
-            
-            if resultados:
-                mejor = resultados[0]
-                md = mejor["metadata"]
+            else:
+                self.status_var.set("Generando descripción técnica...")
+        elif tipo == "token":
+            self.descripcion_text.insert(tk.END, datos[0])
+            self.descripcion_text.see(tk.END)
+        elif tipo == "sancion":
+            self.mostrar_sancion(datos[0])
+            self._terminar_analisis()
+        elif tipo == "fin":
+            self._terminar_analisis()
+        elif tipo == "error":
+            self._terminar_analisis()
+            messagebox.showerror("Error", f"Error durante el análisis:\n{str(datos[0])}")
+            self.status_var.set(f"Error durante el análisis: {str(datos[0])}")
+
+    def mostrar_sancion(self, resultados):
+        """Muestra la sanción recomendada en el panel de resultados"""
+        if resultados:
+            mejor = resultados[0]
+            md = mejor["metadata"]
+            palabras = '\n• '.join(md['palabras_clave'][:3])
+            ejemplos = '\n- '.join(md['ejemplos'][:2])
 
-                texto = f"""⚖️ Sanción Recomendada: {md['penalizacion']}\n
+            texto = f"""⚖️ Sanción Recomendada: {md['penalizacion']}\n
 📜 Artículo: {md['articulo']} ({md['gravedad']}) – {md['tipo']} / {md['subtipo']}\n
 📌 Aplicación: {md['aplicacion']}\n\n
 📝 Descripción:\n{mejor['text']}\n\n
-🔍 Palabras clave detectadas:\n• {'\n• '.join(md['palabras_clave'][:3])}\n\n
-📚 Ejemplos aplicables:\n- {'\n- '.join(md['ejemplos'][:2])}
+🔍 Palabras clave detectadas:\n• {palabras}\n\n
+📚 Ejemplos aplicables:\n- {ejemplos}
 """
-                self.sancion_text.insert(tk.END, texto)
-                self.sancion_text.tag_add('title', '1.0', '1.end')
-                self.sancion_text.tag_add('highlight', '2.0', '2.end')
-                self.status_var.set(f"Análisis completado - Sanción recomendada: {md['penalizacion']}")
+            self.sancion_text.insert(tk.END, texto)
+            self.sancion_text.tag_add('title', '1.0', '1.end')
+            self.sancion_text.tag_add('highlight', '2.0', '2.end')
+            self.status_var.set(f"Análisis completado - Sanción recomendada: {md['penalizacion']}")
+        else:
+            self.sancion_text.insert(tk.END, "✅ No se encontraron infracciones aplicables.", 'success')
+            self.status_var.set("Análisis completado - No se encontraron infracciones aplicables")
+
+    def _terminar_analisis(self):
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.cancel_button.config(state="disabled")
+        if self.ruta_imagen:
+            self.analyze_button.config(state="normal")
+
+    def cancelar_analisis(self):
+        """
+        Cancela el análisis en curso; sus mensajes pendientes se ignoran. El trabajador
+        aborta la petición a LLaVA en ~0.1 s (también antes del primer token) y libera el pool.
+        """
+        if self.cancelar_evento is not None and not self.cancelar_evento.is_set():
+            self.cancelar_evento.set()
+            self.analisis_id += 1
+            self._terminar_analisis()
+            self.status_var.set("Análisis cancelado")
+
+    def cerrar(self):
+        """Cancela el trabajo pendiente y cierra la ventana"""
+        self.cancelar_analisis()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
+    def precargar_modelo(self):
+        """Carga el clasificador en segundo plano e informa en la barra de estado"""
+        self.status_var.set("Cargando modelo en segundo plano...")
+        inicio = time.perf_counter()
+        hilo = precargar_modelo()
+
+        def comprobar():
+            if hilo.is_alive():
+                self.root.after(200, comprobar)
+            elif self.status_var.get() != "Cargando modelo en segundo plano...":
+                return
+            elif hilo.error is not None:
+                self.status_var.set(f"No se pudo cargar el modelo: {hilo.error}")
             else:
-                self.sancion_text.insert(tk.END, "✅ No se encontraron infracciones aplicables.", 'success')
-                self.status_var.set("Análisis completado - No se encontraron infracciones aplicables")
+                self.status_var.set(f"Modelo listo ({time.perf_counter() - inicio:.1f}s)")
+
+        self.root.after(200, comprobar)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Error durante el análisis:\n{str(e)}")
-            self.status_var.set(f"Error durante el análisis: {str(e)}")
-        finally:
-            self.progress.stop()
-            self.progress.pack_forget()
-            if hasattr(self, 'loading'):
-                self.loading.destroy()
-    
-    def show_loading(self):
-        """Muestra ventana de carga durante operaciones largas"""
-        self.loading = tk.Toplevel(self.root)
-        self.loading.title("Procesando")
-        self.loading.geometry("300x100")
-        self.loading.resizable(False, False)
-        
-        # Centrar la ventana
-        x = self.root.winfo_x() + (self.root.winfo_width() // 2) - 150
-        y = self.root.winfo_y() + (self.root.winfo_height() // 2) - 50
-        self.loading.geometry(f"+{x}+{y}")
-        
-        ttk.Label(self.loading, text="Analizando imagen...").pack(pady=10)
-        ttk.Progressbar(self.loading, mode='indeterminate').pack(fill=tk.X, padx=20)
-        
-        self.loading.transient(self.root)
-        self.loading.grab_set()
-        self.root.update()
-    
     def toggle_dark_mode(self):
         """Cambia entre tema claro y oscuro"""
         self.dark_mode = not self.dark_mode
@@ -361,6 +711,7 @@ class App:
     
     def reiniciar_app(self):
         """Reinicia la aplicación al estado inicial"""
+        self.cancelar_analisis()
         self.image_label.config(
             image="", 
             text="Imagen no cargada",
@@ -382,4 +733,8 @@ class App:
 if __name__ == "__main__":
     root = tk.Tk()
     app = App(root)
+    root.update_idletasks()
+    print(f"Ventana lista en {time.perf_counter() - _inicio:.2f}s")
+    # Los pesos se cargan en segundo plano una vez visible la ventana
+    root.after(100, app.precargar_modelo)
     root.mainloop()
\ No newline at end of file
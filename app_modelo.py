@@ -1,18 +1,29 @@
 import torch
 import torch.nn as nn
-from torchvision import transforms, models
+from torchvision import transforms
 from PIL import Image
+import asyncio
 import base64
+import io
 import ollama
 import json
-from typing import List, Dict
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional
+
+from cache_llava import obtener_cache
+from modelos import cargar_checkpoint
+from recuperacion_sanciones import MotorRecuperacion, normalizar_texto
+from respuesta_vlm import ESQUEMA_RESPUESTA, PROMPT_ESTRUCTURADO, IndiceSanciones, parsear_respuesta, texto_libre
 
 # ---------------------------------------------------
 # PARTE 1: Clasificación y descripción con Llava
 # ---------------------------------------------------
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
 # Configuración del modelo de clasificación
 clasificacion_transform = transforms.Compose([
     transforms.Resize(224),
@@ -20,13 +31,108 @@ clasificacion_transform = transforms.Compose([
     transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
 ])
 
-modelo_path = "StewardBot.pth"
-modelo = models.resnet152()
-num_ftrs = modelo.fc.in_features
-modelo.fc = nn.Linear(num_ftrs, 2)
-modelo.load_state_dict(torch.load(modelo_path, map_location=device))
-modelo.to(device)
-modelo.eval()
+# Se puede apuntar a otro checkpoint (p. ej. un alumno destilado) con STEWARDBOT_MODELO
+modelo_path = os.environ.get("STEWARDBOT_MODELO", "StewardBot.pth")
+
+# Backend de inferencia: "pytorch" (eager), "torchscript" o "onnx" (artefactos de exportar_modelo.py).
+# Si no se indica, se deduce de la extensión del modelo.
+EXTENSIONES_BACKEND = {".onnx": "onnx", ".ts": "torchscript"}
+backend = os.environ.get(
+    "STEWARDBOT_BACKEND",
+    EXTENSIONES_BACKEND.get(os.path.splitext(modelo_path)[1].lower(), "pytorch")
+)
+
+# Los artefactos cuantizados y ONNX Runtime se ejecutan en CPU
+device = torch.device("cuda" if torch.cuda.is_available() and backend == "pytorch" else "cpu")
+
+# Registro de modelos cargados por dispositivo: los pesos se leen en la primera clasificación
+_modelos: Dict[str, nn.Module] = {}
+_modelos_lock = threading.Lock()
+tiempos_carga: Dict[str, float] = {}
+
+class ModeloOnnx:
+    """Adapta una sesión de ONNX Runtime a la interfaz de un módulo: tensor -> logits"""
+
+    def __init__(self, path: str):
+        import onnxruntime as ort  # Dependencia opcional, solo para este backend
+        opciones = ort.SessionOptions()
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.sesion = ort.InferenceSession(path, opciones, providers=["CPUExecutionProvider"])
+        self.entrada = self.sesion.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        salida = self.sesion.run(None, {self.entrada: x.detach().cpu().numpy()})[0]
+        return torch.from_numpy(salida)
+
+    def eval(self):
+        return self
+
+def _cargar_pytorch(path: str, dispositivo: torch.device):
+    modelo, meta = cargar_checkpoint(path, dispositivo)
+    print(f"Arquitectura: {meta['arquitectura']}")
+    return modelo
+
+def _cargar_torchscript(path: str, dispositivo: torch.device):
+    modelo = torch.jit.load(path, map_location=dispositivo)
+    modelo.eval()
+    return modelo
+
+def _cargar_onnx(path: str, dispositivo: torch.device):
+    return ModeloOnnx(path)
+
+BACKENDS = {
+    "pytorch": _cargar_pytorch,
+    "torchscript": _cargar_torchscript,
+    "onnx": _cargar_onnx,
+}
+
+def cargar_backend(nombre: str, path: str, dispositivo: torch.device = torch.device("cpu")):
+    """Carga un modelo con el backend indicado; devuelve un invocable tensor -> logits"""
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {nombre}. Opciones: {', '.join(BACKENDS)}")
+    return BACKENDS[nombre](path, dispositivo)
+
+def _construir_modelo(dispositivo: torch.device):
+    """Carga el modelo configurado con el backend activo"""
+    print(f"Backend de inferencia: {backend}")
+    return cargar_backend(backend, modelo_path, dispositivo)
+
+def obtener_modelo(dispositivo: Optional[torch.device] = None) -> nn.Module:
+    """Devuelve el modelo del dispositivo, cargándolo solo la primera vez"""
+    dispositivo = torch.device(dispositivo) if dispositivo is not None else device
+    clave = str(dispositivo)
+    modelo = _modelos.get(clave)
+    if modelo is not None:
+        return modelo
+    with _modelos_lock:
+        if clave not in _modelos:
+            inicio = time.perf_counter()
+            _modelos[clave] = _construir_modelo(dispositivo)
+            tiempos_carga[clave] = time.perf_counter() - inicio
+            print(f"Modelo cargado en {tiempos_carga[clave]:.2f}s ({clave})")
+        return _modelos[clave]
+
+def precargar_modelo(dispositivo: Optional[torch.device] = None, calentar: bool = True) -> threading.Thread:
+    """Carga (y opcionalmente calienta) el modelo en un hilo de fondo"""
+    def _precargar():
+        try:
+            modelo = obtener_modelo(dispositivo)
+            if calentar:
+                with torch.inference_mode():
+                    modelo(torch.zeros(1, 3, 224, 224, device=dispositivo if dispositivo is not None else device))
+        except Exception as e:
+            hilo.error = e
+
+    hilo = threading.Thread(target=_precargar, name="precarga-modelo", daemon=True)
+    hilo.error = None
+    hilo.start()
+    return hilo
+
+def __getattr__(nombre: str):
+    # Compatibilidad: `app_modelo.modelo` sigue disponible, pero se carga al acceder
+    if nombre == "modelo":
+        return obtener_modelo()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 clases = ["con_sancion", "sin_sancion"]
 mensajes = {
@@ -39,17 +145,81 @@ def clasificar_imagen(image_path: str) -> tuple:
     image = Image.open(image_path).convert('RGB')
     image = clasificacion_transform(image).unsqueeze(0).to(device)
     with torch.no_grad():
-        output = modelo(image)
+        output = obtener_modelo()(image)
         _, pred = torch.max(output, 1)
     categoria = clases[pred.item()]
     return mensajes[categoria], categoria
 
-def analizar_imagen(image_path: str) -> str:
-    """Genera descripción técnica de la acción"""
-    with open(image_path, "rb") as img_file:
-        encoded_image = base64.b64encode(img_file.read()).decode("utf-8")
-    
-    prompt = """
+def _cargar_tensor(image_path: str) -> torch.Tensor:
+    """Decodifica y transforma una imagen en CPU"""
+    image = Image.open(image_path).convert('RGB')
+    return clasificacion_transform(image)
+
+def _cargar_tensor_o_error(image_path: str) -> tuple:
+    """(tensor, None) o (None, excepción) para no perder el lote por una imagen corrupta"""
+    try:
+        return _cargar_tensor(image_path), None
+    except Exception as e:
+        return None, e
+
+def inferir_lote(tensores: List[torch.Tensor]) -> List[tuple]:
+    """Ejecuta el modelo sobre un lote y devuelve (índice de clase, confianza) por tensor"""
+    # Resize(224) conserva la relación de aspecto, así que se apilan por tamaño
+    grupos: Dict[tuple, List[int]] = {}
+    for i, tensor in enumerate(tensores):
+        grupos.setdefault(tuple(tensor.shape), []).append(i)
+
+    resultados = [None] * len(tensores)
+    modelo = obtener_modelo()
+    with torch.inference_mode():
+        for indices in grupos.values():
+            lote = torch.stack([tensores[i] for i in indices]).to(device)
+            probabilidades = torch.softmax(modelo(lote), dim=1)
+            confianzas, preds = torch.max(probabilidades, 1)
+            # Una sola sincronización por grupo en lugar de un .item() por imagen
+            for i, pred, confianza in zip(indices, preds.tolist(), confianzas.tolist()):
+                resultados[i] = (pred, confianza)
+    return resultados
+
+def clasificar_imagenes(image_paths: Iterable[str], batch_size: int = 32,
+                        num_workers: Optional[int] = None, omitir_errores: bool = False) -> List[Dict]:
+    """
+    Clasifica muchas imágenes por lotes y devuelve categoría y confianza de cada una.
+    Con `omitir_errores`, una imagen que no se puede leer no interrumpe el lote:
+    su resultado lleva categoría None y el motivo en "error".
+    """
+    rutas = list(image_paths)
+    if num_workers is None:
+        num_workers = min(8, os.cpu_count() or 1)
+    lotes = [rutas[i:i + batch_size] for i in range(0, len(rutas), batch_size)]
+
+    resultados = []
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        # Se decodifica el lote siguiente mientras se infiere el actual
+        pendientes = [pool.submit(_cargar_tensor_o_error, r) for r in lotes[0]] if lotes else []
+        for n, lote_rutas in enumerate(lotes):
+            cargados = [f.result() for f in pendientes]
+            pendientes = [pool.submit(_cargar_tensor_o_error, r) for r in lotes[n + 1]] if n + 1 < len(lotes) else []
+            lote = []
+            for ruta, (_, error) in zip(lote_rutas, cargados):
+                if error is not None and not omitir_errores:
+                    raise error
+                lote.append({"ruta": ruta, "categoria": None, "mensaje": None, "confianza": None,
+                             "error": f"{type(error).__name__}: {error}"} if error is not None else None)
+            validos = [i for i, (_, error) in enumerate(cargados) if error is None]
+            if validos:
+                for i, (pred, confianza) in zip(validos, inferir_lote([cargados[i][0] for i in validos])):
+                    categoria = clases[pred]
+                    lote[i] = {
+                        "ruta": lote_rutas[i],
+                        "categoria": categoria,
+                        "mensaje": mensajes[categoria],
+                        "confianza": confianza
+                    }
+            resultados.extend(lote)
+    return resultados
+
+PROMPT_ANALISIS = """
     Analiza la imagen de carrera con foco en posibles infracciones reglamentarias. Responde EXCLUSIVAMENTE en este formato:
     
     1. **Acción observada**: [adelantamiento/defensa/frenada/salida de pista]
@@ -59,14 +229,164 @@ def analizar_imagen(image_path: str) -> str:
     5. **Bandera visible**: [sí/no + tipo si es visible]
     6. **Posible infracción**: [Bloqueo/Cambio múltiple de línea/Salida peligrosa/Defensa agresiva]
     """
-    
+
+MODELO_VLM = "llava"
+
+# LLaVA trabaja a 336 px (hasta 672 px por mosaico en 1.6): enviar el frame a resolución
+# completa solo infla el payload y el prefill. STEWARDBOT_VLM_LADO=0 envía el archivo original.
+VLM_LADO_MAXIMO = int(os.environ.get("STEWARDBOT_VLM_LADO", "672"))
+VLM_CALIDAD_JPEG = int(os.environ.get("STEWARDBOT_VLM_CALIDAD", "85"))
+
+def preparar_imagen_vlm(datos: bytes, lado_maximo: Optional[int] = None, calidad: Optional[int] = None) -> bytes:
+    """Reduce la imagen al lado máximo del VLM y la recodifica en JPEG en memoria (sin archivo temporal)"""
+    lado_maximo = VLM_LADO_MAXIMO if lado_maximo is None else lado_maximo
+    calidad = VLM_CALIDAD_JPEG if calidad is None else calidad
+    if not lado_maximo:
+        return datos
+    imagen = Image.open(io.BytesIO(datos))
+    if max(imagen.size) <= lado_maximo and imagen.format == "JPEG":
+        return datos
+    # draft() deja que el decodificador JPEG reduzca directamente a una escala cercana
+    imagen.draft("RGB", (lado_maximo, lado_maximo))
+    imagen = imagen.convert("RGB")
+    imagen.thumbnail((lado_maximo, lado_maximo), Image.BICUBIC)
+    salida = io.BytesIO()
+    imagen.save(salida, format="JPEG", quality=calidad)
+    return salida.getvalue()
+
+def clave_vlm(cache, datos: bytes, modelo: str = MODELO_VLM, prompt: str = PROMPT_ANALISIS,
+              lado_maximo: Optional[int] = None, calidad: Optional[int] = None) -> tuple:
+    """Clave de caché que incluye el preprocesado: otra resolución o calidad es otra respuesta"""
+    lado_maximo = VLM_LADO_MAXIMO if lado_maximo is None else lado_maximo
+    calidad = VLM_CALIDAD_JPEG if calidad is None else calidad
+    if lado_maximo:
+        modelo = f"{modelo}@{lado_maximo}px-q{calidad}"
+    return cache.clave(datos, modelo, prompt)
+
+def analizar_imagen(image_path: str, usar_cache: bool = True) -> str:
+    """Genera descripción técnica de la acción"""
+    with open(image_path, "rb") as img_file:
+        return analizar_bytes(img_file.read(), usar_cache)
+
+def analizar_bytes(datos: bytes, usar_cache: bool = True) -> str:
+    """Como analizar_imagen, para una imagen ya en memoria (p. ej. recibida por HTTP)"""
+    cache = obtener_cache() if usar_cache else None
+    if cache is not None:
+        clave = clave_vlm(cache, datos)
+        guardada = cache.obtener(clave)
+        if guardada is not None:
+            return guardada
+
+    encoded_image = base64.b64encode(preparar_imagen_vlm(datos)).decode("utf-8")
     response = ollama.generate(
-        model="llava",
-        prompt=prompt,
+        model=MODELO_VLM,
+        prompt=PROMPT_ANALISIS,
         images=[encoded_image]
     )
-    
-    return response.get("response", "Error al generar la descripción")
+
+    if "response" not in response:
+        return "Error al generar la descripción"
+    descripcion = response["response"]
+    if cache is not None:
+        cache.guardar(clave, descripcion)
+    return descripcion
+
+async def _hasta_cancelar(corrutina, cancelar: Optional[threading.Event], intervalo: float = 0.1):
+    """
+    Espera la corrutina; si se activa `cancelar`, la cancela. Cancelar la tarea
+    cierra la conexión HTTP aunque el modelo aún no haya enviado ningún token.
+    """
+    tarea = asyncio.ensure_future(corrutina)
+    while not tarea.done():
+        if cancelar is not None and cancelar.is_set():
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
+            return None
+        await asyncio.wait({tarea}, timeout=intervalo)
+    return tarea.result()
+
+def analizar_imagen_stream(image_path: str, cancelar: Optional[threading.Event] = None,
+                           usar_cache: bool = True) -> Iterator[str]:
+    """
+    Igual que analizar_imagen, pero devuelve los tokens a medida que llegan.
+    `cancelar` aborta la petición en curso en ~0.1 s, también durante el prefill.
+    """
+    with open(image_path, "rb") as img_file:
+        datos = img_file.read()
+
+    cache = obtener_cache() if usar_cache else None
+    if cache is not None:
+        clave = clave_vlm(cache, datos)
+        guardada = cache.obtener(clave)
+        if guardada is not None:
+            yield guardada
+            return
+
+    encoded_image = base64.b64encode(preparar_imagen_vlm(datos)).decode("utf-8")
+
+    # Cliente asíncrono propio en un bucle de este hilo: una petición bloqueante
+    # no se puede interrumpir desde fuera, una tarea de asyncio sí
+    bucle = asyncio.new_event_loop()
+    cliente = ollama.AsyncClient()
+
+    async def siguiente(stream):
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    partes = []
+    try:
+        stream = bucle.run_until_complete(cliente.generate(
+            model=MODELO_VLM,
+            prompt=PROMPT_ANALISIS,
+            images=[encoded_image],
+            stream=True
+        ))
+        while True:
+            chunk = bucle.run_until_complete(_hasta_cancelar(siguiente(stream), cancelar))
+            if cancelar is not None and cancelar.is_set():
+                return
+            if chunk is None:
+                break
+            texto = chunk.get("response", "")
+            partes.append(texto)
+            yield texto
+    finally:
+        bucle.run_until_complete(cliente.close())
+        bucle.run_until_complete(bucle.shutdown_asyncgens())
+        bucle.close()
+
+    # Solo se guarda una respuesta completa
+    if cache is not None and partes:
+        cache.guardar(clave, "".join(partes))
+
+def analizar_imagen_estructurado(image_path: str, usar_cache: bool = True) -> Dict[str, str]:
+    """Pide al VLM la respuesta en JSON (modo `format` de Ollama) y la devuelve como campos tipados"""
+    with open(image_path, "rb") as img_file:
+        return analizar_bytes_estructurado(img_file.read(), usar_cache)
+
+def analizar_bytes_estructurado(datos: bytes, usar_cache: bool = True) -> Dict[str, str]:
+    """Como analizar_imagen_estructurado, para una imagen ya en memoria"""
+    cache = obtener_cache() if usar_cache else None
+    if cache is not None:
+        clave = clave_vlm(cache, datos, prompt=PROMPT_ESTRUCTURADO)
+        guardada = cache.obtener(clave)
+        if guardada is not None:
+            return parsear_respuesta(guardada)
+
+    response = ollama.generate(
+        model=MODELO_VLM,
+        prompt=PROMPT_ESTRUCTURADO,
+        images=[base64.b64encode(preparar_imagen_vlm(datos)).decode("utf-8")],
+        format=ESQUEMA_RESPUESTA,
+        options={"temperature": 0}
+    )
+    respuesta = response.get("response", "")
+    campos = parsear_respuesta(respuesta)
+    if cache is not None and campos:
+        cache.guardar(clave, respuesta)
+    return campos
 
 # ---------------------------------------------------
 # PARTE 2: Búsqueda de sanciones en JSON
@@ -77,25 +397,178 @@ def cargar_sanciones(json_path: str = "sanciones.json") -> List[Dict]:
     with open(json_path) as f:
         return json.load(f)
 
+class MatcherSanciones:
+    """
+    Índice invertido palabra clave -> sanciones con una única regex compilada.
+    Se construye una vez y puntúa una descripción en una sola pasada.
+    """
+
+    def __init__(self, sanciones: List[Dict]):
+        self.sanciones = sanciones
+        # palabra clave normalizada -> índices de las sanciones que la usan
+        self.indice: Dict[str, List[int]] = {}
+        for i, sancion in enumerate(sanciones):
+            for kw in sancion["metadata"]["palabras_clave"]:
+                self.indice.setdefault(normalizar_texto(kw), []).append(i)
+
+        # Palabras clave contenidas dentro de otras ("bloqueo" en "bloqueo extremo")
+        self.contenidas = {
+            kw: [otra for otra in self.indice if otra != kw and otra in kw]
+            for kw in self.indice
+        }
+
+        # Alternativas de mayor a menor longitud: en cada posición gana la más larga
+        alternativas = sorted(self.indice, key=len, reverse=True)
+        self.patron = re.compile("(?=(" + "|".join(map(re.escape, alternativas)) + "))")
+
+    def palabras_presentes(self, texto_normalizado: str) -> set:
+        """Conjunto de palabras clave que aparecen en el texto"""
+        presentes = set()
+        for match in self.patron.finditer(texto_normalizado):
+            kw = match.group(1)
+            if kw not in presentes:
+                presentes.add(kw)
+                presentes.update(self.contenidas[kw])
+        return presentes
+
+    def puntuar(self, descripcion: str) -> List[tuple]:
+        """Devuelve [(índice de sanción, puntaje)] ordenado de mayor a menor puntaje"""
+        texto = normalizar_texto(descripcion)
+        coincidencias: Dict[int, int] = {}
+        for kw in self.palabras_presentes(texto):
+            for i in self.indice[kw]:
+                coincidencias[i] = coincidencias.get(i, 0) + 1
+
+        # Puntaje basado en coincidencias y gravedad
+        extra = 0.5 if "agresiv" in texto else 0
+        puntuados = [(i, n + extra) for i, n in coincidencias.items()]
+        # A igual puntaje se respeta el orden del reglamento
+        return sorted(puntuados, key=lambda x: (-x[1], x[0]))
+
+# Dos niveles: por identidad, O(1) en cada búsqueda sobre la misma lista, y por
+# contenido, que se serializa una sola vez por lista nueva para que recargar el mismo
+# JSON reutilice la regex compilada. Ambos LRU están acotados y no acumulan listas viejas.
+MAX_MATCHERS = 4
+_matchers_por_lista: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (sanciones, matcher)
+_matchers_por_contenido: "OrderedDict[str, MatcherSanciones]" = OrderedDict()
+_matchers_lock = threading.Lock()
+
+def _recordar(cache: OrderedDict, clave, valor):
+    cache[clave] = valor
+    cache.move_to_end(clave)
+    if len(cache) > MAX_MATCHERS:
+        cache.popitem(last=False)
+
+def obtener_matcher(sanciones: List[Dict]) -> MatcherSanciones:
+    """Reutiliza el matcher ya compilado para estas sanciones"""
+    with _matchers_lock:
+        # Se guarda la propia lista: su id no puede reutilizarse mientras siga en la caché
+        guardado = _matchers_por_lista.get(id(sanciones))
+        if guardado is not None and guardado[0] is sanciones:
+            _matchers_por_lista.move_to_end(id(sanciones))
+            return guardado[1]
+
+    clave = json.dumps(list(sanciones), sort_keys=True, ensure_ascii=False)
+    with _matchers_lock:
+        matcher = _matchers_por_contenido.get(clave)
+        if matcher is None:
+            matcher = MatcherSanciones(sanciones)
+        _recordar(_matchers_por_contenido, clave, matcher)
+        _recordar(_matchers_por_lista, id(sanciones), (sanciones, matcher))
+        return matcher
+
+def _resultados(sanciones, puntuados: List[tuple]) -> List[Dict]:
+    """Crea resultados nuevos sin modificar las sanciones compartidas"""
+    return [dict(sanciones[i], puntaje=puntaje) for i, puntaje in puntuados]
+
 def buscar_sanciones(descripcion: str, sanciones: List[Dict]) -> List[Dict]:
     """Busca sanciones relevantes en base a la descripción"""
-    resultados = []
-    descripcion_lower = descripcion.lower()
-    
-    for sancion in sanciones:
-        # Verificar coincidencia en palabras clave
-        palabras_clave = sancion["metadata"]["palabras_clave"]
-        coincidencias = sum(1 for kw in palabras_clave if kw.lower() in descripcion_lower)
-        
-        # Puntaje basado en coincidencias y gravedad
-        if coincidencias > 0:
-            sancion["puntaje"] = coincidencias + (
-                0.5 if "agresiv" in descripcion_lower else 0
-            )
-            resultados.append(sancion)
-    
-    # Ordenar por puntaje (mayor primero)
-    return sorted(resultados, key=lambda x: x["puntaje"], reverse=True)
+    return _resultados(sanciones, obtener_matcher(sanciones).puntuar(descripcion))
+
+# Peso de cada palabra clave exacta frente a la similitud semántica (0-1)
+PESO_PALABRAS_CLAVE = 0.1
+# Similitud mínima: por debajo solo hay coincidencias de palabras sueltas (con TF-IDF,
+# una descripción real de la infracción supera 0.25 y las coincidencias casuales rondan 0.05-0.12)
+UMBRAL_SIMILITUD = 0.15
+
+class RepositorioSanciones:
+    """
+    Sanciones cargadas una sola vez y compartidas en solo lectura entre hilos.
+    El JSON se vuelve a leer únicamente si cambia su fecha de modificación.
+    Si la descripción trae los campos del prompt (JSON o lista numerada) se resuelve
+    directamente por tipo/subtipo; si no, la búsqueda es semántica (recuperacion_sanciones)
+    reforzada con las palabras clave.
+    """
+
+    def __init__(self, json_path: str = "sanciones.json", umbral: float = UMBRAL_SIMILITUD):
+        self.json_path = json_path
+        self.indice_path = os.path.splitext(json_path)[0] + "_indice.npz"
+        self.umbral = umbral
+        self._lock = threading.Lock()
+        # (mtime, sanciones, matcher, motor, indice): se sustituye entera para que los lectores no vean estados a medias
+        self._estado = None
+
+    def _actual(self) -> tuple:
+        """Devuelve el estado vigente, recargando si el archivo cambió"""
+        mtime = os.stat(self.json_path).st_mtime_ns
+        estado = self._estado
+        if estado is not None and estado[0] == mtime:
+            return estado
+        with self._lock:
+            if self._estado is None or self._estado[0] != mtime:
+                sanciones = tuple(cargar_sanciones(self.json_path))
+                motor = MotorRecuperacion(sanciones, self.indice_path)
+                self._estado = (mtime, sanciones, MatcherSanciones(sanciones), motor, IndiceSanciones(sanciones))
+            return self._estado
+
+    @property
+    def sanciones(self) -> tuple:
+        return self._actual()[1]
+
+    def buscar(self, descripcion: str, k: int = 3) -> List[Dict]:
+        """Busca sanciones relevantes; cada resultado es un dict nuevo con su puntaje"""
+        campos = parsear_respuesta(descripcion)
+        # El VLM descartó expresamente la infracción: el resto de campos no la contradice
+        if campos.get("infraccion") == "ninguna":
+            return []
+        if campos:
+            resultados = self.buscar_campos(campos)
+            if resultados:
+                return resultados[:k]
+
+        # Solo el texto libre: las etiquetas de la plantilla y los valores ya resueltos
+        # por los campos ("sin contacto", "recta"...) se parecen a sanciones por sí solos
+        consulta = texto_libre(descripcion)
+        if not consulta.strip():
+            return []
+        _, sanciones, matcher, motor, _ = self._actual()
+        puntajes = {i: similitud for i, similitud in motor.buscar(consulta, k, self.umbral)}
+        # Una palabra clave literal sigue siendo una señal fuerte: suma sobre la similitud
+        for i, n in matcher.puntuar(consulta):
+            puntajes[i] = puntajes.get(i, 0.0) + PESO_PALABRAS_CLAVE * n
+        puntuados = sorted(puntajes.items(), key=lambda x: (-x[1], x[0]))[:k]
+        return _resultados(sanciones, [(i, round(p, 4)) for i, p in puntuados])
+
+    def buscar_palabras_clave(self, descripcion: str) -> List[Dict]:
+        """Búsqueda anterior, solo por coincidencia literal de palabras clave"""
+        _, sanciones, matcher, _, _ = self._actual()
+        return _resultados(sanciones, matcher.puntuar(descripcion))
+
+    def buscar_campos(self, campos: Dict[str, str]) -> List[Dict]:
+        """Resuelve los campos de parsear_respuesta con búsquedas en el índice por atributo"""
+        _, sanciones, _, _, indice = self._actual()
+        return _resultados(sanciones, indice.buscar(campos))
+
+_repositorios: Dict[str, RepositorioSanciones] = {}
+_repositorios_lock = threading.Lock()
+
+def obtener_repositorio(json_path: str = "sanciones.json") -> RepositorioSanciones:
+    """Repositorio compartido por ruta de archivo"""
+    ruta = os.path.abspath(json_path)
+    with _repositorios_lock:
+        if ruta not in _repositorios:
+            _repositorios[ruta] = RepositorioSanciones(ruta)
+        return _repositorios[ruta]
 
 def mostrar_resultados(resultados: List[Dict]):
     """Muestra los resultados de forma legible"""
@@ -134,6 +607,5 @@ if __name__ == "__main__":
         print(descripcion_generada)
         
         # 3. Búsqueda de sanciones
-        sanciones = cargar_sanciones()
-        resultados = buscar_sanciones(descripcion_generada, sanciones)
+        resultados = obtener_repositorio().buscar(descripcion_generada)
         mostrar_resultados(resultados)
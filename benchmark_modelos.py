@@ -0,0 +1,62 @@
+import argparse
+import torch
+from torchvision import datasets
+from torch.utils.data import DataLoader, Subset
+
+from app_StewardBot import data_transform, dividir_estratificado
+from modelos import BACKBONES, cargar_checkpoint, crear_backbone, medir_fps
+
+# ---------------------------------------------------
+# Benchmark precisión vs. frames/segundo por backbone
+# ---------------------------------------------------
+
+def medir_accuracy(model, dataloader, device):
+    corrects = torch.zeros((), dtype=torch.long, device=device)
+    total = 0
+    with torch.inference_mode():
+        for inputs, labels in dataloader:
+            preds = model(inputs.to(device)).argmax(1)
+            corrects += (preds == labels.to(device)).sum()
+            total += labels.size(0)
+    return corrects.item() / total if total else float("nan")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara precisión y velocidad de los checkpoints")
+    parser.add_argument("checkpoints", nargs="*", help="archivos .pth a evaluar (guardan su arquitectura)")
+    parser.add_argument("--arquitecturas", nargs="*", default=[], choices=list(BACKBONES),
+                        help="mide solo velocidad de arquitecturas sin entrenar")
+    parser.add_argument("--data-dir", default="accidentes")
+    parser.add_argument("--val", type=float, default=0.2,
+                        help="evalúa sobre el mismo split de validación que el entrenamiento (0 = todo el dataset)")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--cpu", action="store_true", help="fuerza la CPU aunque haya CUDA")
+    args = parser.parse_args()
+
+    device = torch.device("cpu" if args.cpu or not torch.cuda.is_available() else "cuda")
+    print(f"Usando dispositivo: {device}")
+
+    dataloader = None
+    if args.checkpoints:
+        dataset = datasets.ImageFolder(root=args.data_dir, transform=data_transform)
+        if args.val > 0:
+            _, val_idx = dividir_estratificado(dataset.targets, args.val, args.semilla)
+            dataset = Subset(dataset, val_idx)
+        dataloader = DataLoader(dataset, batch_size=args.batch, shuffle=False, num_workers=4)
+
+    candidatos = [(path, lambda p=path: cargar_checkpoint(p, device)) for path in args.checkpoints]
+    candidatos += [(arq, lambda a=arq: (crear_backbone(a).to(device).eval(), {"arquitectura": a}))
+                   for arq in args.arquitecturas]
+
+    filas = []
+    for nombre, cargar in candidatos:
+        model, meta = cargar()
+        accuracy = medir_accuracy(model, dataloader, device) if nombre in args.checkpoints else float("nan")
+        fps_1 = medir_fps(model, device, 1)
+        fps_lote = medir_fps(model, device, args.batch)
+        parametros = sum(p.numel() for p in model.parameters()) / 1e6
+        filas.append((nombre, meta["arquitectura"], parametros, accuracy, fps_1, fps_lote))
+
+    print(f"\n{'Modelo':<30} {'Arquitectura':<20} {'Params(M)':>9} {'Accuracy':>9} {'FPS b=1':>9} {f'FPS b={args.batch}':>10}")
+    for nombre, arq, parametros, accuracy, fps_1, fps_lote in sorted(filas, key=lambda f: -f[5]):
+        print(f"{nombre:<30} {arq:<20} {parametros:>9.1f} {accuracy:>9.4f} {fps_1:>9.1f} {fps_lote:>10.1f}")
@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import sys
+import time
+
+from app_modelo import preparar_imagen_vlm
+from cliente_vlm import ClienteVLM
+from utilidades_imagenes import listar_imagenes
+
+# -----------------------
+# Latencia de LLaVA con y sin el preprocesado de imagen
+# -----------------------
+
+parser = argparse.ArgumentParser(description="Mide payload y latencia extremo a extremo del VLM según la resolución enviada")
+parser.add_argument("imagenes", nargs="*", help="imágenes a describir (por defecto, una muestra de --carpetas)")
+parser.add_argument("--carpetas", nargs="*", default=["pruebas", "accidentes"])
+parser.add_argument("--num", type=int, default=10)
+parser.add_argument("--lados", type=int, nargs="*", default=[0, 672, 336], help="lado máximo a probar (0 = archivo original)")
+parser.add_argument("--calidad", type=int, default=85)
+parser.add_argument("--host", default=None)
+args = parser.parse_args()
+
+rutas = args.imagenes or listar_imagenes(args.carpetas, args.num)
+if not rutas:
+    sys.exit(f"No se encontraron imágenes en {', '.join(args.carpetas)}")
+originales = []
+for ruta in rutas:
+    with open(ruta, "rb") as f:
+        originales.append(f.read())
+
+
+async def medir(lado):
+    # Sin caché y de una en una: se mide la latencia de cada petición, no el throughput
+    async with ClienteVLM(host=args.host, concurrencia=1, usar_cache=False,
+                          lado_maximo=lado, calidad=args.calidad) as cliente:
+        inicio = time.perf_counter()
+        for datos in originales:
+            await cliente.describir(datos)
+        total = time.perf_counter() - inicio
+    return cliente, total
+
+
+print(f"Imágenes: {len(rutas)}")
+print(f"{'lado':>8} {'payload KB':>11} {'prep. ms':>9} {'media s':>8} {'p50 s':>7} {'p95 s':>7} {'total s':>8}")
+referencia = None
+for lado in args.lados:
+    inicio = time.perf_counter()
+    for datos in originales:
+        preparar_imagen_vlm(datos, lado, args.calidad)
+    prep_ms = (time.perf_counter() - inicio) * 1000 / len(originales)
+
+    cliente, total = asyncio.run(medir(lado))
+    r = cliente.latencias.resumen()
+    referencia = referencia or r["media"]
+    print(f"{lado or 'original':>8} {cliente.bytes_enviados / 1024 / len(originales):>11.0f} {prep_ms:>9.1f} "
+          f"{r['media']:>8.2f} {r['p50']:>7.2f} {r['p95']:>7.2f} {total:>8.1f}  ({r['media'] / referencia:.2f}x)")
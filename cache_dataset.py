@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+from modelos import reemplazar_cabeza
+
+# ---------------------------------------------------
+# Caché de características del backbone en disco (memory-mapped)
+# ---------------------------------------------------
+
+def huella_dataset(dataset) -> str:
+    """
+    Huella del contenido de un ImageFolder: rutas, tamaños y fechas de modificación.
+    Cambia en cuanto se añade, borra o modifica una imagen.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(dataset.classes).encode("utf-8"))
+    for ruta, label in dataset.samples:
+        st = os.stat(ruta)
+        h.update(f"{os.path.relpath(ruta, dataset.root)}|{label}|{st.st_size}|{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+MEDIA = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+DESVIACION = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+
+def normalizar_lote(inputs: torch.Tensor, device) -> torch.Tensor:
+    """
+    Mueve un lote al dispositivo. Si viene en uint8 (dataset materializado),
+    aplica ahí el equivalente a ToTensor() + Normalize().
+    """
+    inputs = inputs.to(device, non_blocking=True)
+    if inputs.dtype != torch.uint8:
+        return inputs
+    return (inputs.float().div_(255) - MEDIA.to(device)) / DESVIACION.to(device)
+
+
+def _leer_meta(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def extraer_features(model: nn.Module, dataset, cache_dir: str, device,
+                     batch_size: int = 50, num_workers: int = 4, clave_extra: str = ""):
+    """
+    Ejecuta el backbone (todo menos la capa final) una sola vez sobre el dataset y guarda
+    las características penúltimas en `features.npy`. Devuelve (features, labels)
+    como arrays memory-mapped. Si la huella del dataset no cambió, reutiliza la caché.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    features_path = os.path.join(cache_dir, "features.npy")
+    labels_path = os.path.join(cache_dir, "labels.npy")
+    meta_path = os.path.join(cache_dir, "meta.json")
+
+    huella = huella_dataset(dataset) + clave_extra
+    meta = _leer_meta(meta_path)
+    if meta is not None and meta.get("huella") == huella and os.path.exists(features_path):
+        print(f"Usando características en caché: {features_path}")
+        return np.load(features_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r")
+
+    print("Extrayendo características del backbone (solo esta vez)...")
+    cabeza = reemplazar_cabeza(model, nn.Identity())
+    model.eval()
+    try:
+        loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+        features = None
+        labels = np.empty(len(dataset), dtype=np.int64)
+        inicio = 0
+        with torch.inference_mode():
+            for inputs, batch_labels in loader:
+                salida = model(normalizar_lote(inputs, device)).float().cpu().numpy()
+                if features is None:
+                    features = np.lib.format.open_memmap(
+                        features_path, mode="w+", dtype=np.float32,
+                        shape=(len(dataset), salida.shape[1])
+                    )
+                fin = inicio + len(salida)
+                features[inicio:fin] = salida
+                labels[inicio:fin] = batch_labels.numpy()
+                inicio = fin
+        features.flush()
+        del features
+        np.save(labels_path, labels)
+    finally:
+        reemplazar_cabeza(model, cabeza)
+
+    # La meta se escribe al final: una extracción interrumpida no queda marcada como válida
+    with open(meta_path, "w") as f:
+        json.dump({"huella": huella, "clases": dataset.classes, "n": len(dataset)}, f)
+    return np.load(features_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r")
+
+
+# ---------------------------------------------------
+# Dataset de imágenes ya decodificadas en un único shard memory-mapped
+# ---------------------------------------------------
+
+class DatasetMaterializado(Dataset):
+    """
+    Imágenes de un ImageFolder ya redimensionadas y recortadas, guardadas como
+    uint8 (N, 3, H, W) en `imagenes.npy`, con etiquetas y rutas en `indice.json`.
+    __getitem__ devuelve una vista del memmap sin copiar ni decodificar JPEG;
+    la normalización se hace por lote con normalizar_lote.
+    """
+
+    def __init__(self, cache_dir: str):
+        with open(os.path.join(cache_dir, "indice.json")) as f:
+            indice = json.load(f)
+        self.root = indice["root"]
+        self.classes = indice["clases"]
+        self.class_to_idx = {c: i for i, c in enumerate(self.classes)}
+        self.samples = [(ruta, label) for ruta, label in zip(indice["rutas"], indice["labels"])]
+        self.targets = indice["labels"]
+        # Copy-on-write: los tensores se crean sobre el mapa sin copiar y sin poder alterar el archivo
+        self.imagenes = np.load(os.path.join(cache_dir, "imagenes.npy"), mmap_mode="c")
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        return torch.from_numpy(self.imagenes[i]), self.targets[i]
+
+
+def materializar_dataset(dataset, pre_transform, cache_dir: str) -> DatasetMaterializado:
+    """
+    Aplica una sola vez las transformaciones deterministas (Resize/CenterCrop) a un
+    ImageFolder y guarda el resultado en un shard uint8. Se regenera si cambia el dataset.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    imagenes_path = os.path.join(cache_dir, "imagenes.npy")
+    indice_path = os.path.join(cache_dir, "indice.json")
+
+    huella = huella_dataset(dataset) + "|" + repr(pre_transform)
+    indice = _leer_meta(indice_path)
+    if indice is not None and indice.get("huella") == huella and os.path.exists(imagenes_path):
+        print(f"Usando dataset materializado: {imagenes_path}")
+        return DatasetMaterializado(cache_dir)
+
+    print("Materializando dataset decodificado (solo esta vez)...")
+    imagenes = None
+    for i, (ruta, _) in enumerate(dataset.samples):
+        img = pre_transform(Image.open(ruta).convert("RGB"))
+        array = np.asarray(img, dtype=np.uint8).transpose(2, 0, 1)  # HWC -> CHW
+        if imagenes is None:
+            imagenes = np.lib.format.open_memmap(
+                imagenes_path, mode="w+", dtype=np.uint8, shape=(len(dataset.samples), *array.shape)
+            )
+        imagenes[i] = array
+    imagenes.flush()
+    del imagenes
+
+    with open(indice_path, "w") as f:
+        json.dump({
+            "huella": huella,
+            "root": dataset.root,
+            "clases": dataset.classes,
+            "rutas": [ruta for ruta, _ in dataset.samples],
+            "labels": [label for _, label in dataset.samples],
+        }, f)
+    return DatasetMaterializado(cache_dir)
@@ -0,0 +1,136 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict
+
+# ---------------------------------------------------
+# Caché persistente de descripciones generadas por el VLM
+# ---------------------------------------------------
+
+CACHE_PATH = "llava_cache.sqlite"
+TAMANO_MAXIMO = 64 * 1024 * 1024  # bytes de texto almacenado antes de desalojar
+
+
+def hash_bytes(datos: bytes) -> str:
+    """Hash de contenido usado como parte de la clave"""
+    return hashlib.sha256(datos).hexdigest()
+
+
+class CacheDescripciones:
+    """
+    Caché en SQLite indexada por (hash de la imagen, modelo, hash del prompt).
+    Desaloja por LRU cuando el tamaño total de las respuestas supera `tamano_maximo`.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, tamano_maximo: int = TAMANO_MAXIMO):
+        self.path = path
+        self.tamano_maximo = tamano_maximo
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS descripciones (
+                imagen TEXT NOT NULL,
+                modelo TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                respuesta TEXT NOT NULL,
+                tamano INTEGER NOT NULL,
+                ultimo_acceso REAL NOT NULL,
+                PRIMARY KEY (imagen, modelo, prompt)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ultimo_acceso ON descripciones (ultimo_acceso)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def clave(imagen: bytes, modelo: str, prompt: str) -> tuple:
+        """Construye la clave de la caché a partir del contenido"""
+        return hash_bytes(imagen), modelo, hash_bytes(prompt.encode("utf-8"))
+
+    def obtener(self, clave: tuple) -> Optional[str]:
+        """Devuelve la respuesta guardada o None, actualizando el orden LRU"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT respuesta FROM descripciones WHERE imagen=? AND modelo=? AND prompt=?",
+                clave
+            ).fetchone()
+            if fila is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self._conn.execute(
+                "UPDATE descripciones SET ultimo_acceso=? WHERE imagen=? AND modelo=? AND prompt=?",
+                (time.time(), *clave)
+            )
+            self._conn.commit()
+            return fila[0]
+
+    def guardar(self, clave: tuple, respuesta: str):
+        """Guarda una respuesta y desaloja las entradas menos usadas si hace falta"""
+        tamano = len(respuesta.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descripciones VALUES (?, ?, ?, ?, ?, ?)",
+                (*clave, respuesta, tamano, time.time())
+            )
+            self._desalojar()
+            self._conn.commit()
+
+    def _desalojar(self):
+        """Elimina entradas por antigüedad de acceso hasta quedar bajo el límite"""
+        total = self._conn.execute("SELECT COALESCE(SUM(tamano), 0) FROM descripciones").fetchone()[0]
+        if total <= self.tamano_maximo:
+            return
+        cursor = self._conn.execute(
+            "SELECT rowid, tamano FROM descripciones ORDER BY ultimo_acceso ASC"
+        )
+        a_borrar = []
+        for rowid, tamano in cursor:
+            if total <= self.tamano_maximo:
+                break
+            a_borrar.append((rowid,))
+            total -= tamano
+        self._conn.executemany("DELETE FROM descripciones WHERE rowid=?", a_borrar)
+
+    def estadisticas(self) -> Dict:
+        """Contadores de aciertos/fallos y ocupación actual"""
+        with self._lock:
+            entradas, tamano = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM descripciones"
+            ).fetchone()
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "entradas": entradas,
+            "tamano": tamano,
+        }
+
+    def limpiar(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._conn.execute("DELETE FROM descripciones")
+            self._conn.commit()
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache() -> CacheDescripciones:
+    """Instancia compartida de la caché, creada en el primer uso"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheDescripciones()
+        return _cache
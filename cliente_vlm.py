@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import bisect
+import random
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import ollama
+
+from app_modelo import MODELO_VLM, PROMPT_ANALISIS, clave_vlm, preparar_imagen_vlm
+from cache_llava import obtener_cache
+
+# ---------------------------------------------------
+# Cliente asíncrono de Ollama: sesión persistente y peticiones concurrentes
+# ---------------------------------------------------
+
+LIMITES_HISTOGRAMA = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)  # segundos
+VENTANA_PERCENTILES = 2048  # muestras recientes sobre las que se calculan p50/p95
+
+
+class Histograma:
+    """
+    Conteos por cubetas fijas y percentiles sobre las últimas `ventana` muestras:
+    la memoria y el coste de resumen() no crecen aunque el proceso viva semanas.
+    """
+
+    unidad = ""
+
+    def __init__(self, limites, ventana: int = VENTANA_PERCENTILES):
+        self.limites = tuple(limites)
+        self.cubetas = [0] * (len(self.limites) + 1)
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self.recientes: deque = deque(maxlen=ventana)
+
+    def registrar(self, valor: float):
+        self.cubetas[bisect.bisect_left(self.limites, valor)] += 1
+        self.total += 1
+        self.suma += valor
+        self.maximo = max(self.maximo, valor)
+        self.recientes.append(valor)
+
+    def percentil(self, p: float) -> float:
+        if not self.recientes:
+            return 0.0
+        ordenadas = sorted(self.recientes)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+    def resumen(self) -> Dict:
+        etiquetas = [f"<={l}{self.unidad}" for l in self.limites] + [f">{self.limites[-1]}{self.unidad}"]
+        return {
+            "total": self.total,
+            "media": self.suma / self.total if self.total else 0.0,
+            "p50": self.percentil(50),
+            "p95": self.percentil(95),
+            "max": self.maximo,
+            "cubetas": dict(zip(etiquetas, self.cubetas)),
+        }
+
+
+class HistogramaLatencias(Histograma):
+    """Latencias por petición, en segundos"""
+
+    unidad = "s"
+
+    def __init__(self, limites=LIMITES_HISTOGRAMA, ventana: int = VENTANA_PERCENTILES):
+        super().__init__(limites, ventana)
+
+    def resumen(self) -> Dict:
+        r = super().resumen()
+        r["peticiones"] = r.pop("total")
+        return r
+
+    def __str__(self):
+        r = self.resumen()
+        cubetas = " ".join(f"{k}:{v}" for k, v in r["cubetas"].items() if v)
+        return (f"{r['peticiones']} peticiones - media {r['media']:.2f}s - p50 {r['p50']:.2f}s "
+                f"- p95 {r['p95']:.2f}s - máx {r['max']:.2f}s | {cubetas}")
+
+
+def _reintentable(error: Exception) -> bool:
+    """Errores transitorios: red, timeouts, servidor saturado (429) o caído (5xx)"""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError))
+
+
+class ClienteVLM:
+    """
+    Cliente de Ollama con una única sesión HTTP reutilizada (keep-alive), un
+    semáforo que limita las peticiones simultáneas, timeout por petición y
+    reintentos con espera exponencial. Usar dentro de `async with`.
+    """
+
+    def __init__(self, host: Optional[str] = None, modelo: str = MODELO_VLM, prompt: str = PROMPT_ANALISIS,
+                 concurrencia: int = 2, timeout: float = 120.0, reintentos: int = 3,
+                 espera_base: float = 0.5, usar_cache: bool = True,
+                 lado_maximo: Optional[int] = None, calidad: Optional[int] = None,
+                 formato: Optional[Dict] = None):
+        self.host = host
+        self.modelo = modelo
+        self.prompt = prompt
+        self.concurrencia = concurrencia
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.lado_maximo = lado_maximo
+        self.calidad = calidad
+        # Esquema JSON para el modo `format` de Ollama (p. ej. respuesta_vlm.ESQUEMA_RESPUESTA)
+        self.formato = formato
+        self.cache = obtener_cache() if usar_cache else None
+        self.latencias = HistogramaLatencias()
+        self.esperas = HistogramaLatencias()  # tiempo en cola hasta obtener turno en el semáforo
+        self.num_reintentos = 0
+        self.errores = 0
+        self.bytes_originales = 0
+        self.bytes_enviados = 0
+        self._cliente: Optional[ollama.AsyncClient] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        # La sesión y el semáforo pertenecen al bucle de eventos que los crea
+        limites = httpx.Limits(max_connections=self.concurrencia, max_keepalive_connections=self.concurrencia)
+        self._cliente = ollama.AsyncClient(host=self.host, limits=limites)
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._cliente is not None:
+            await self._cliente.close()
+        self._cliente = None
+
+    async def _generar(self, imagen_b64: str) -> str:
+        for intento in range(self.reintentos + 1):
+            en_cola = time.perf_counter()
+            try:
+                async with self._semaforo:
+                    # La latencia se mide desde que hay turno: la espera en cola se registra aparte
+                    inicio = time.perf_counter()
+                    self.esperas.registrar(inicio - en_cola)
+                    respuesta = await asyncio.wait_for(
+                        self._cliente.generate(model=self.modelo, prompt=self.prompt, images=[imagen_b64],
+                                               **self._opciones_generacion()),
+                        timeout=self.timeout,
+                    )
+                    self.latencias.registrar(time.perf_counter() - inicio)
+                return respuesta["response"]
+            except Exception as e:
+                if intento == self.reintentos or not _reintentable(e):
+                    raise
+                self.num_reintentos += 1
+                # Espera exponencial con jitter para no reintentar todos a la vez
+                await asyncio.sleep(self.espera_base * 2 ** intento * (0.5 + random.random()))
+
+    def _opciones_generacion(self) -> Dict:
+        if self.formato is None:
+            return {}
+        return {"format": self.formato, "options": {"temperature": 0}}
+
+    async def describir(self, datos: bytes) -> str:
+        """Descripción de una imagen (bytes), consultando antes la caché persistente"""
+        clave = None
+        if self.cache is not None:
+            clave = clave_vlm(self.cache, datos, self.modelo, self.prompt, self.lado_maximo, self.calidad)
+            guardada = self.cache.obtener(clave)
+            if guardada is not None:
+                return guardada
+        # Redimensionar y recodificar es CPU: fuera del bucle de eventos
+        enviados = await asyncio.to_thread(preparar_imagen_vlm, datos, self.lado_maximo, self.calidad)
+        self.bytes_originales += len(datos)
+        self.bytes_enviados += len(enviados)
+        descripcion = await self._generar(base64.b64encode(enviados).decode("utf-8"))
+        if clave is not None:
+            self.cache.guardar(clave, descripcion)
+        return descripcion
+
+    async def describir_rutas(self, rutas: List[str], al_terminar: Optional[Callable] = None) -> List[Optional[str]]:
+        """
+        Describe varias imágenes en paralelo; un fallo definitivo devuelve None en su posición.
+        `al_terminar(ruta, descripcion, segundos)` se llama por cada descripción correcta
+        en cuanto llega, p. ej. para persistirla antes de que acabe el lote.
+        """
+        async def una(ruta):
+            inicio = time.perf_counter()
+            try:
+                with open(ruta, "rb") as f:
+                    datos = f.read()
+                descripcion = await self.describir(datos)
+            except Exception as e:
+                self.errores += 1
+                print(f"Error describiendo {ruta}: {e}")
+                return None
+            if al_terminar is not None:
+                al_terminar(ruta, descripcion, time.perf_counter() - inicio)
+            return descripcion
+
+        return await asyncio.gather(*(una(ruta) for ruta in rutas))
+
+    def resumen(self) -> Dict:
+        return {"latencias": self.latencias.resumen(), "esperas": self.esperas.resumen(),
+                "reintentos": self.num_reintentos, "errores": self.errores,
+                "bytes_originales": self.bytes_originales, "bytes_enviados": self.bytes_enviados}
+
+    def __str__(self):
+        texto = (f"VLM: {self.latencias} - espera en cola p95 {self.esperas.percentil(95):.2f}s "
+                 f"- reintentos: {self.num_reintentos} - errores: {self.errores}")
+        if self.bytes_originales:
+            texto += f" - payload {self.bytes_enviados / 1024:.0f}/{self.bytes_originales / 1024:.0f} KB"
+        return texto
+
+
+def describir_imagenes(rutas: List[str], al_terminar: Optional[Callable] = None, **opciones) -> List[Optional[str]]:
+    """Versión síncrona de ClienteVLM.describir_rutas para código que no usa asyncio"""
+    async def ejecutar():
+        async with ClienteVLM(**opciones) as cliente:
+            descripciones = await cliente.describir_rutas(rutas, al_terminar)
+        print(cliente)
+        return descripciones
+
+    return asyncio.run(ejecutar())
+
+
+if __name__ == "__main__":
+    import sys
+    for ruta, descripcion in zip(sys.argv[1:], describir_imagenes(sys.argv[1:], concurrencia=4)):
+        print(f"\n{ruta}:\n{descripcion if descripcion is not None else '(sin descripción)'}")
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from filtro_frames import distancia_hamming, phash
+from utilidades_imagenes import listar_imagenes
+
+# ---------------------------------------------------
+# Índice de duplicados casi idénticos del dataset (pHash + BK-tree)
+# ---------------------------------------------------
+
+class ArbolBK:
+    """Árbol BK sobre la distancia de Hamming: busca vecinos sin comparar contra todo el índice"""
+
+    def __init__(self):
+        self.raiz = None  # [hash, elementos, hijos por distancia]
+
+    def insertar(self, h: int, elemento):
+        if self.raiz is None:
+            self.raiz = [h, [elemento], {}]
+            return
+        nodo = self.raiz
+        while True:
+            d = distancia_hamming(h, nodo[0])
+            if d == 0:
+                nodo[1].append(elemento)
+                return
+            if d not in nodo[2]:
+                nodo[2][d] = [h, [elemento], {}]
+                return
+            nodo = nodo[2][d]
+
+    def buscar(self, h: int, radio: int) -> List:
+        """Elementos cuyo hash está a distancia <= radio"""
+        encontrados = []
+        pendientes = [self.raiz] if self.raiz is not None else []
+        while pendientes:
+            nodo = pendientes.pop()
+            d = distancia_hamming(h, nodo[0])
+            if d <= radio:
+                encontrados.extend(nodo[1])
+            # Desigualdad triangular: solo los hijos en [d - radio, d + radio] pueden estar cerca
+            pendientes.extend(hijo for dist, hijo in nodo[2].items() if d - radio <= dist <= d + radio)
+        return encontrados
+
+
+def hash_imagen(ruta: str) -> Optional[int]:
+    # Decodificación reducida en gris: el pHash solo necesita una miniatura
+    datos = np.fromfile(ruta, dtype=np.uint8)
+    imagen = cv2.imdecode(datos, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    return phash(imagen) if imagen is not None else None
+
+
+def calcular_hashes(raiz: str, rutas: List[str], num_workers: int = None) -> Dict[str, int]:
+    """pHash de cada imagen en paralelo (OpenCV libera el GIL al decodificar)"""
+    with ThreadPoolExecutor(num_workers or min(8, os.cpu_count() or 1)) as pool:
+        hashes = pool.map(hash_imagen, (os.path.join(raiz, r) for r in rutas))
+        resultado = {}
+        for ruta, h in zip(rutas, hashes):
+            if h is None:
+                print(f"No se pudo leer {ruta}, se omite.")
+            else:
+                resultado[ruta] = h
+    return resultado
+
+
+def agrupar_duplicados(hashes: Dict[str, int], umbral: int) -> List[List[str]]:
+    """
+    Agrupa las imágenes cuyo pHash difiere en <= umbral bits (enlace simple:
+    una ráfaga A~B~C queda en un único grupo aunque A y C estén más lejos).
+    """
+    rutas = list(hashes)
+    arbol = ArbolBK()
+    padre = list(range(len(rutas)))
+
+    def encontrar(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    for i, ruta in enumerate(rutas):
+        for j in arbol.buscar(hashes[ruta], umbral):
+            padre[encontrar(i)] = encontrar(j)
+        arbol.insertar(hashes[ruta], i)
+
+    grupos: Dict[int, List[str]] = {}
+    for i, ruta in enumerate(rutas):
+        grupos.setdefault(encontrar(i), []).append(ruta)
+    return sorted((sorted(g) for g in grupos.values()), key=lambda g: (-len(g), g[0]))
+
+
+def clase_de(ruta: str) -> str:
+    """En un ImageFolder la clase es la primera carpeta de la ruta relativa"""
+    partes = ruta.replace("\\", "/").split("/")
+    return partes[0] if len(partes) > 1 else ""
+
+
+def construir_manifiesto(raiz: str, umbral: int = 6, num_workers: int = None) -> Dict:
+    """
+    Conserva una imagen por grupo de duplicados y clase. Los grupos que mezclan
+    clases se conservan por clase y se señalan como conflictos de etiquetado.
+    """
+    rutas = listar_imagenes(raiz, relativas=True)
+    hashes = calcular_hashes(raiz, rutas, num_workers)
+    conservar, clusters, conflictos = [], [], 0
+    for grupo in agrupar_duplicados(hashes, umbral):
+        por_clase: Dict[str, List[str]] = {}
+        for ruta in grupo:
+            por_clase.setdefault(clase_de(ruta), []).append(ruta)
+        conservar.extend(miembros[0] for miembros in por_clase.values())
+        if len(grupo) > 1:
+            clusters.append({"imagenes": grupo, "conservadas": [m[0] for m in por_clase.values()],
+                             "clases": sorted(por_clase)})
+            conflictos += len(por_clase) > 1
+    return {
+        "raiz": os.path.abspath(raiz),
+        "metodo": "phash",
+        "umbral": umbral,
+        "total": len(hashes),
+        "conservar": sorted(conservar),
+        "clusters": clusters,
+        "conflictos": conflictos,
+        "hashes": {ruta: f"{h:016x}" for ruta, h in hashes.items()},
+    }
+
+
+def indices_manifiesto(dataset, manifiesto_path: str) -> List[int]:
+    """
+    Índices de un ImageFolder (o DatasetMaterializado) que el manifiesto conserva.
+    Lanza ValueError si el manifiesto es de otra carpeta o no conserva ninguna imagen.
+    """
+    with open(manifiesto_path) as f:
+        manifiesto = json.load(f)
+    raiz = os.path.realpath(manifiesto["raiz"])
+    if raiz != os.path.realpath(dataset.root):
+        raise ValueError(f"El manifiesto '{manifiesto_path}' es de '{manifiesto['raiz']}', no de '{dataset.root}'. "
+                         "Vuelve a generarlo con deduplicar_dataset.py")
+
+    conservar = set(manifiesto["conservar"])
+    analizadas = manifiesto.get("hashes", {})
+    relativas = [os.path.relpath(ruta, dataset.root) for ruta, _ in dataset.samples]
+    indices = [i for i, ruta in enumerate(relativas) if ruta in conservar]
+    if not indices:
+        raise ValueError(f"El manifiesto '{manifiesto_path}' no conserva ninguna imagen de '{dataset.root}'")
+    nuevas = sum(ruta not in analizadas for ruta in relativas)
+    if nuevas:
+        print(f"⚠️ {nuevas} imágenes no estaban en el manifiesto y se excluyen; conviene regenerarlo")
+    return indices
+
+
+def mostrar_resumen(manifiesto: Dict, max_clusters: int = 10):
+    duplicados = manifiesto["total"] - len(manifiesto["conservar"])
+    print(f"Imágenes: {manifiesto['total']} - grupos de duplicados: {len(manifiesto['clusters'])} "
+          f"- se descartan {duplicados} ({duplicados / max(1, manifiesto['total']):.1%})")
+    if manifiesto["conflictos"]:
+        print(f"⚠️ {manifiesto['conflictos']} grupos mezclan clases (posibles errores de etiquetado)")
+    for cluster in manifiesto["clusters"][:max_clusters]:
+        marca = " [conflicto]" if len(cluster["clases"]) > 1 else ""
+        print(f"- {len(cluster['imagenes'])} imágenes{marca}: {', '.join(cluster['imagenes'][:6])}"
+              f"{' ...' if len(cluster['imagenes']) > 6 else ''}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detecta imágenes casi duplicadas del dataset y genera un manifiesto")
+    parser.add_argument("raiz", nargs="?", default="accidentes", help="carpeta con una subcarpeta por clase")
+    parser.add_argument("--umbral", type=int, default=6, help="bits distintos (0-64) del pHash para considerar duplicado")
+    parser.add_argument("--manifiesto", default=None, help="guarda el manifiesto deduplicado en este JSON")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    manifiesto = construir_manifiesto(args.raiz, args.umbral, args.workers)
+    mostrar_resumen(manifiesto)
+    if args.manifiesto:
+        with open(args.manifiesto, "w") as f:
+            json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        print(f"Manifiesto guardado en '{args.manifiesto}' (usar con app_StewardBot.py --manifiesto {args.manifiesto})")
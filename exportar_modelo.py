@@ -0,0 +1,96 @@
+import argparse
+import os
+import torch
+import torch.nn as nn
+from PIL import Image
+
+from app_modelo import clasificacion_transform
+from modelos import cargar_checkpoint
+from utilidades_imagenes import listar_imagenes
+
+# ---------------------------------------------------
+# Exportación del clasificador para inferencia en CPU
+# ---------------------------------------------------
+
+def cuantizar_dinamico(model: nn.Module) -> nn.Module:
+    """INT8 dinámico: pesos de las capas lineales en int8, activaciones cuantizadas al vuelo"""
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def cuantizar_estatico(model: nn.Module, rutas_calibracion) -> nn.Module:
+    """
+    INT8 estático (FX graph mode) para cuantizar también las convoluciones,
+    que son casi todo el coste de una CNN. Requiere imágenes de calibración.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    ejemplo = (torch.randn(1, 3, 224, 224),)
+    preparado = prepare_fx(model, get_default_qconfig_mapping("x86"), ejemplo)
+    with torch.inference_mode():
+        for ruta in rutas_calibracion:
+            preparado(clasificacion_transform(Image.open(ruta).convert("RGB")).unsqueeze(0))
+    return convert_fx(preparado)
+
+
+def exportar_torchscript(model: nn.Module, salida: str):
+    ejemplo = torch.randn(1, 3, 224, 224)
+    with torch.inference_mode():
+        trazado = torch.jit.trace(model, ejemplo)
+        trazado = torch.jit.freeze(trazado.eval())
+    torch.jit.save(trazado, salida)
+
+
+def exportar_onnx(model: nn.Module, salida: str, int8: bool):
+    ejemplo = torch.randn(1, 3, 224, 224)
+    fp32 = salida
+    if int8:
+        # El modelo FP32 intermedio va junto a la salida: modelo.onnx -> modelo_fp32.onnx
+        raiz, extension = os.path.splitext(salida)
+        fp32 = f"{raiz}_fp32{extension or '.onnx'}"
+    # Resize(224) conserva la relación de aspecto: alto y ancho son dinámicos
+    torch.onnx.export(
+        model, ejemplo, fp32,
+        input_names=["imagen"], output_names=["logits"],
+        dynamic_axes={"imagen": {0: "batch", 2: "alto", 3: "ancho"}, "logits": {0: "batch"}},
+        opset_version=17,
+    )
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32, salida, weight_type=QuantType.QInt8)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta StewardBot a TorchScript u ONNX, con cuantización INT8")
+    parser.add_argument("--modelo", default="StewardBot.pth")
+    parser.add_argument("--formato", choices=["torchscript", "onnx"], default="torchscript")
+    parser.add_argument("--cuantizacion", choices=["ninguna", "dinamica", "estatica"], default="dinamica",
+                        help="'dinamica' cuantiza las capas lineales; 'estatica' también las convoluciones (solo TorchScript)")
+    parser.add_argument("--calibracion", nargs="*", default=["accidentes"],
+                        help="carpetas de imágenes para calibrar la cuantización estática")
+    parser.add_argument("--num-calibracion", type=int, default=200)
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+
+    model, meta = cargar_checkpoint(args.modelo, torch.device("cpu"))
+    print(f"Arquitectura: {meta['arquitectura']}")
+    base = os.path.splitext(args.modelo)[0]
+    sufijo = "" if args.cuantizacion == "ninguna" else "_int8"
+
+    if args.formato == "onnx":
+        if args.cuantizacion == "estatica":
+            parser.error("La cuantización estática solo está disponible para TorchScript")
+        salida = args.salida or f"{base}{sufijo}.onnx"
+        exportar_onnx(model, salida, int8=args.cuantizacion == "dinamica")
+    else:
+        if args.cuantizacion == "dinamica":
+            model = cuantizar_dinamico(model)
+        elif args.cuantizacion == "estatica":
+            rutas = listar_imagenes(args.calibracion, args.num_calibracion)
+            print(f"Calibrando con {len(rutas)} imágenes...")
+            model = cuantizar_estatico(model, rutas)
+        salida = args.salida or f"{base}{sufijo}.ts"
+        exportar_torchscript(model, salida)
+
+    print(f"Modelo exportado como '{salida}'")
+    print(f"Para usarlo: STEWARDBOT_MODELO={salida} (backend {'onnx' if args.formato == 'onnx' else 'torchscript'})")
@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+from typing import Dict
+
+# ---------------------------------------------------
+# Pre-filtro de frames casi idénticos antes de la ResNet
+# ---------------------------------------------------
+
+
+def _gris(frame: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+
+def dhash(frame: np.ndarray, tamano: int = 8) -> int:
+    """Hash perceptual por diferencias: compara píxeles vecinos de una miniatura en gris"""
+    pequeno = cv2.resize(_gris(frame), (tamano + 1, tamano), interpolation=cv2.INTER_AREA)
+    bits = pequeno[:, 1:] > pequeno[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phash(frame: np.ndarray, tamano: int = 8) -> int:
+    """Hash perceptual por DCT: signo de las frecuencias bajas frente a su mediana"""
+    pequeno = cv2.resize(_gris(frame), (tamano * 4, tamano * 4), interpolation=cv2.INTER_AREA)
+    bajas = cv2.dct(np.float32(pequeno))[:tamano, :tamano]
+    # La componente continua (brillo medio) no se tiene en cuenta para la mediana
+    bits = bajas > np.median(bajas.flatten()[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def distancia_hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def histograma(frame: np.ndarray, bins: int = 32) -> np.ndarray:
+    """Histograma HSV normalizado (matiz y saturación) de una versión reducida del frame"""
+    pequeno = cv2.resize(frame, (160, 90), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(pequeno, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [bins, bins], [0, 180, 0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+
+class FiltroFrames:
+    """
+    Decide si un frame merece pasar por el clasificador comparándolo con el último
+    frame clasificado. Si el cambio queda por debajo del umbral, se reutiliza el veredicto.
+    - metodo="dhash": umbral = bits distintos (0-64) del hash perceptual.
+    - metodo="histograma": umbral = distancia de Bhattacharyya (0-1) entre histogramas HSV.
+    """
+
+    def __init__(self, metodo: str = "dhash", umbral: float = None):
+        if metodo not in ("dhash", "histograma"):
+            raise ValueError(f"Método desconocido: {metodo}. Opciones: dhash, histograma")
+        self.metodo = metodo
+        self.umbral = umbral if umbral is not None else (6 if metodo == "dhash" else 0.1)
+        self._referencia = None
+        self.procesados = 0
+        self.omitidos = 0
+
+    def _firma(self, frame: np.ndarray):
+        return dhash(frame) if self.metodo == "dhash" else histograma(frame)
+
+    def _distancia(self, a, b) -> float:
+        if self.metodo == "dhash":
+            return distancia_hamming(a, b)
+        return cv2.compareHist(a, b, cv2.HISTCMP_BHATTACHARYYA)
+
+    def debe_clasificar(self, frame: np.ndarray) -> bool:
+        """True si el frame cambió lo suficiente respecto al último clasificado"""
+        self.procesados += 1
+        firma = self._firma(frame)
+        if self._referencia is not None and self._distancia(firma, self._referencia) < self.umbral:
+            self.omitidos += 1
+            return False
+        self._referencia = firma
+        return True
+
+    def reiniciar(self):
+        self._referencia = None
+
+    def resumen(self) -> Dict:
+        return {
+            "procesados": self.procesados,
+            "clasificados": self.procesados - self.omitidos,
+            "inferencias_ahorradas": self.omitidos,
+            "ahorro": self.omitidos / self.procesados if self.procesados else 0.0,
+        }
+
+    def __str__(self):
+        r = self.resumen()
+        return (f"Pre-filtro ({self.metodo}): {r['inferencias_ahorradas']}/{r['procesados']} "
+                f"inferencias ahorradas ({r['ahorro']:.1%})")
@@ -0,0 +1,197 @@
+import cv2
+import os
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ---------------------------------------------------
+# Segmentación temporal de incidentes sobre los veredictos por frame
+# ---------------------------------------------------
+
+
+def probabilidad_sancion(categoria: str, confianza: float) -> float:
+    """Convierte (categoría, confianza) del clasificador en P(con_sancion)"""
+    return confianza if categoria == "con_sancion" else 1.0 - confianza
+
+
+class SegmentadorIncidentes:
+    """
+    Agrupa frames sancionables consecutivos en intervalos de incidente:
+    - suaviza P(con_sancion) con una media móvil de `ventana` frames,
+    - histéresis: abre un incidente al superar `umbral_alto` y lo cierra al bajar de `umbral_bajo`,
+    - une incidentes separados por menos de `max_hueco` segundos,
+    - descarta los que duran menos de `min_duracion` segundos.
+    """
+
+    def __init__(self, umbral_alto: float = 0.7, umbral_bajo: float = 0.4, ventana: int = 5,
+                 min_duracion: float = 0.5, max_hueco: float = 1.0):
+        if umbral_bajo > umbral_alto:
+            raise ValueError("umbral_bajo no puede ser mayor que umbral_alto")
+        self.umbral_alto = umbral_alto
+        self.umbral_bajo = umbral_bajo
+        self.min_duracion = min_duracion
+        self.max_hueco = max_hueco
+        self._ventana = deque(maxlen=ventana)
+        self._actual: Optional[Dict] = None     # incidente abierto
+        self._pendiente: Optional[Dict] = None  # cerrado, a la espera de saber si se une al siguiente
+        self.frames_procesados = 0
+        self.frames_sancionables = 0
+
+    def procesar(self, frame_index: int, timestamp: float, prob: float) -> List[Dict]:
+        """Añade un frame y devuelve los incidentes que ya son definitivos"""
+        self.frames_procesados += 1
+        if prob >= 0.5:
+            self.frames_sancionables += 1
+        self._ventana.append(prob)
+        suavizada = sum(self._ventana) / len(self._ventana)
+        listos = []
+
+        if self._actual is None:
+            if suavizada >= self.umbral_alto:
+                self._actual = {
+                    "inicio_frame": frame_index, "fin_frame": frame_index,
+                    "inicio": timestamp, "fin": timestamp,
+                    "keyframe": frame_index, "keyframe_timestamp": timestamp,
+                    "puntaje_max": prob, "suma": prob, "frames": 1,
+                }
+            elif self._pendiente is not None and timestamp - self._pendiente["fin"] > self.max_hueco:
+                listos.extend(self._emitir(self._pendiente))
+                self._pendiente = None
+            return listos
+
+        if suavizada < self.umbral_bajo:
+            return self._cerrar_actual()
+
+        incidente = self._actual
+        incidente["fin_frame"], incidente["fin"] = frame_index, timestamp
+        incidente["suma"] += prob
+        incidente["frames"] += 1
+        # El keyframe representativo es el frame con mayor probabilidad de sanción
+        if prob > incidente["puntaje_max"]:
+            incidente["puntaje_max"] = prob
+            incidente["keyframe"], incidente["keyframe_timestamp"] = frame_index, timestamp
+        return listos
+
+    def finalizar(self) -> List[Dict]:
+        """Cierra lo que quede abierto al terminar el stream"""
+        listos = self._cerrar_actual() if self._actual is not None else []
+        if self._pendiente is not None:
+            listos.extend(self._emitir(self._pendiente))
+            self._pendiente = None
+        return listos
+
+    def _cerrar_actual(self) -> List[Dict]:
+        """Cierra el incidente abierto; se une al pendiente si el hueco es pequeño"""
+        listos = []
+        cerrado, self._actual = self._actual, None
+        if self._pendiente is not None and cerrado["inicio"] - self._pendiente["fin"] <= self.max_hueco:
+            cerrado = self._unir(self._pendiente, cerrado)
+        elif self._pendiente is not None:
+            listos.extend(self._emitir(self._pendiente))
+        self._pendiente = cerrado
+        return listos
+
+    @staticmethod
+    def _unir(a: Dict, b: Dict) -> Dict:
+        mejor = a if a["puntaje_max"] >= b["puntaje_max"] else b
+        return {
+            "inicio_frame": a["inicio_frame"], "fin_frame": b["fin_frame"],
+            "inicio": a["inicio"], "fin": b["fin"],
+            "keyframe": mejor["keyframe"], "keyframe_timestamp": mejor["keyframe_timestamp"],
+            "puntaje_max": mejor["puntaje_max"], "suma": a["suma"] + b["suma"],
+            "frames": a["frames"] + b["frames"],
+        }
+
+    def _emitir(self, incidente: Dict) -> List[Dict]:
+        if incidente["fin"] - incidente["inicio"] < self.min_duracion:
+            return []
+        resultado = {k: v for k, v in incidente.items() if k != "suma"}
+        resultado["puntaje_medio"] = incidente["suma"] / incidente["frames"]
+        return [resultado]
+
+
+def segmentar(veredictos: Iterable[Tuple[int, float, str, float]], **opciones) -> Iterator[Dict]:
+    """
+    Consume (frame_index, timestamp, categoria, confianza), p. ej. de
+    pipeline_video.clasificar_video, y produce los incidentes en cuanto se cierran.
+    """
+    segmentador = SegmentadorIncidentes(**opciones)
+    for frame_index, timestamp, categoria, confianza in veredictos:
+        yield from segmentador.procesar(frame_index, timestamp, probabilidad_sancion(categoria, confianza))
+    yield from segmentador.finalizar()
+
+
+def guardar_keyframes(video_path: str, incidentes: List[Dict], output_dir: str = "incidentes") -> List[str]:
+    """Guarda un JPEG por incidente (su keyframe). Son pocos, así que un seek por incidente es barato."""
+    os.makedirs(output_dir, exist_ok=True)
+    nombre = os.path.splitext(os.path.basename(video_path))[0]
+    cap = cv2.VideoCapture(video_path)
+    rutas = []
+    try:
+        for n, incidente in enumerate(incidentes, start=1):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, incidente["keyframe"])
+            ret, frame = cap.read()
+            if not ret:
+                print(f"No se pudo leer el keyframe {incidente['keyframe']} de {video_path}.")
+                rutas.append(None)
+                continue
+            ruta = os.path.join(output_dir, f"{nombre}_incidente{n}_frame{incidente['keyframe']}.jpg")
+            cv2.imwrite(ruta, frame)
+            rutas.append(ruta)
+    finally:
+        cap.release()
+    return rutas
+
+
+def detectar_incidentes(video_path: str, paso: int = 5, analizar: bool = True,
+                        output_dir: str = "incidentes", filtro=None, concurrencia_vlm: int = 2,
+                        opciones_vlm: Optional[Dict] = None, **opciones) -> List[Dict]:
+    """
+    Clasifica el video en streaming, lo segmenta en incidentes y envía un único
+    keyframe por incidente al VLM en lugar de un frame por veredicto.
+    `opciones_vlm` se pasa a ClienteVLM (host, prompt, formato...); el resto de
+    opciones configura el SegmentadorIncidentes.
+    """
+    from app_modelo import obtener_repositorio
+    from cliente_vlm import describir_imagenes
+    from filtro_frames import FiltroFrames
+    from pipeline_video import clasificar_video
+
+    filtro = filtro if filtro is not None else FiltroFrames()
+
+    segmentador = SegmentadorIncidentes(**opciones)
+    incidentes = []
+    for frame_index, timestamp, categoria, confianza in clasificar_video(video_path, paso=paso, filtro=filtro):
+        incidentes.extend(segmentador.procesar(frame_index, timestamp, probabilidad_sancion(categoria, confianza)))
+    incidentes.extend(segmentador.finalizar())
+
+    for incidente, ruta in zip(incidentes, guardar_keyframes(video_path, incidentes, output_dir)):
+        incidente["keyframe_ruta"] = ruta
+
+    # Los keyframes se describen en paralelo sobre una única sesión con Ollama
+    pendientes = [i for i in incidentes if analizar and i["keyframe_ruta"] is not None]
+    if pendientes:
+        descripciones = describir_imagenes([i["keyframe_ruta"] for i in pendientes],
+                                           **{"concurrencia": concurrencia_vlm, **(opciones_vlm or {})})
+        for incidente, descripcion in zip(pendientes, descripciones):
+            incidente["descripcion"] = descripcion
+            if descripcion is None:
+                # Sin descripción no hay sanción que buscar; el incidente se conserva igualmente
+                incidente["error"] = "No se pudo generar la descripción"
+                incidente["sancion"] = None
+                continue
+            resultados = obtener_repositorio().buscar(descripcion)
+            incidente["sancion"] = resultados[0] if resultados else None
+
+    print(f"Frames clasificados: {segmentador.frames_procesados} - sancionables: {segmentador.frames_sancionables} "
+          f"- incidentes: {len(incidentes)} (llamadas al VLM: {len(incidentes)} en lugar de {segmentador.frames_sancionables})")
+    print(filtro)
+    return incidentes
+
+
+if __name__ == "__main__":
+    import sys
+    for incidente in detectar_incidentes(sys.argv[1], analizar="--sin-vlm" not in sys.argv):
+        sancion = incidente.get("sancion")
+        penalizacion = sancion["metadata"]["penalizacion"] if sancion else "-"
+        print(f"{incidente['inicio']:.1f}s - {incidente['fin']:.1f}s | keyframe {incidente['keyframe']} "
+              f"| P máx {incidente['puntaje_max']:.2f} | {penalizacion}")
@@ -0,0 +1,104 @@
+import time
+import torch
+import torch.nn as nn
+from torchvision import models
+from typing import Dict, List, Optional, Tuple
+
+# ---------------------------------------------------
+# Registro de backbones para el clasificador de incidentes
+# ---------------------------------------------------
+
+# nombre -> constructor de torchvision. La capa final se sustituye por una de `num_clases`.
+BACKBONES = {
+    "resnet18": models.resnet18,
+    "resnet50": models.resnet50,
+    "resnet152": models.resnet152,
+    "mobilenet_v3_small": models.mobilenet_v3_small,
+    "mobilenet_v3_large": models.mobilenet_v3_large,
+    "efficientnet_b0": models.efficientnet_b0,
+}
+
+# Los checkpoints antiguos (state_dict sin metadatos) son todos ResNet-152
+ARQUITECTURA_LEGADO = "resnet152"
+CLASES = ["con_sancion", "sin_sancion"]
+
+
+def obtener_cabeza(model: nn.Module) -> nn.Linear:
+    """Devuelve la capa lineal final, sea `fc` (ResNet) o el último módulo de `classifier`"""
+    if isinstance(getattr(model, "fc", None), nn.Module):
+        return model.fc
+    return model.classifier[-1]
+
+
+def reemplazar_cabeza(model: nn.Module, modulo: nn.Module) -> nn.Module:
+    """Sustituye la capa final y devuelve la anterior"""
+    if isinstance(getattr(model, "fc", None), nn.Module):
+        anterior, model.fc = model.fc, modulo
+    else:
+        anterior, model.classifier[-1] = model.classifier[-1], modulo
+    return anterior
+
+
+def crear_backbone(arquitectura: str, num_clases: int = 2, preentrenado: bool = False,
+                   congelar: bool = False) -> nn.Module:
+    """Crea la arquitectura indicada con una capa final de `num_clases` salidas"""
+    if arquitectura not in BACKBONES:
+        raise ValueError(f"Arquitectura desconocida: {arquitectura}. Opciones: {', '.join(BACKBONES)}")
+    model = BACKBONES[arquitectura](weights="DEFAULT" if preentrenado else None)
+
+    if congelar:
+        for param in model.parameters():
+            param.requires_grad = False
+
+    num_ftrs = obtener_cabeza(model).in_features
+    reemplazar_cabeza(model, nn.Linear(num_ftrs, num_clases))
+    return model
+
+
+def guardar_checkpoint(state_dict: Dict, arquitectura: str, path: str,
+                       clases: Optional[List[str]] = None, **extra):
+    """Guarda los pesos junto con la arquitectura y las clases para poder reconstruir el modelo"""
+    torch.save({
+        "arquitectura": arquitectura,
+        "clases": list(clases or CLASES),
+        "state_dict": state_dict,
+        **extra,
+    }, path)
+
+
+def cargar_checkpoint(path: str, device=None) -> Tuple[nn.Module, Dict]:
+    """
+    Reconstruye el modelo de un checkpoint y lo deja en modo evaluación.
+    Acepta también los .pth antiguos que solo contienen el state_dict de ResNet-152.
+    """
+    datos = torch.load(path, map_location=device)
+    if isinstance(datos, dict) and "state_dict" in datos and "arquitectura" in datos:
+        meta = {k: v for k, v in datos.items() if k != "state_dict"}
+        state_dict = datos["state_dict"]
+    else:
+        meta = {"arquitectura": ARQUITECTURA_LEGADO, "clases": list(CLASES)}
+        state_dict = datos
+
+    model = crear_backbone(meta["arquitectura"], num_clases=len(meta["clases"]))
+    model.load_state_dict(state_dict)
+    if device is not None:
+        model.to(device)
+    model.eval()
+    return model, meta
+
+
+def medir_fps(model: nn.Module, device, batch_size: int, repeticiones: int = 10, calentamiento: int = 3) -> float:
+    """Frames por segundo con entradas sintéticas de 224x224"""
+    device = torch.device(device)
+    entrada = torch.randn(batch_size, 3, 224, 224, device=device)
+    with torch.inference_mode():
+        for _ in range(calentamiento):
+            model(entrada)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            model(entrada)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+    return batch_size * repeticiones / (time.perf_counter() - inicio)
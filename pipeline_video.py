@@ -0,0 +1,141 @@
+import cv2
+import queue
+import threading
+from PIL import Image
+from typing import Iterator, Optional, Tuple
+
+from app_modelo import clasificacion_transform, inferir_lote, clases
+from filtro_frames import FiltroFrames
+
+# ---------------------------------------------------
+# Pipeline de video a veredicto sin pasar por disco
+# ---------------------------------------------------
+
+_FIN = object()  # Marca de fin de stream entre etapas
+
+
+def _poner(cola: queue.Queue, item, detener: threading.Event) -> bool:
+    """Encola respetando la señal de parada; devuelve False si se debe abortar"""
+    while not detener.is_set():
+        try:
+            cola.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _decodificar(video_path: str, paso: int, salida: queue.Queue,
+                 detener: threading.Event, error: list, filtro: Optional[FiltroFrames] = None):
+    """
+    Etapa 1: decodifica frames con OpenCV y los envía en memoria.
+    Los frames que el filtro considera duplicados viajan sin imagen (None).
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"No se pudo abrir el video {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        idx = 0
+        while not detener.is_set():
+            # grab() avanza sin decodificar; retrieve() solo en los frames que se clasifican
+            if not cap.grab():
+                break
+            if idx % paso == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    timestamp = idx / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    if filtro is not None and not filtro.debe_clasificar(frame):
+                        frame = None
+                    if not _poner(salida, (idx, timestamp, frame), detener):
+                        break
+            idx += 1
+    except Exception as e:
+        error.append(e)
+    finally:
+        cap.release()
+        _poner(salida, _FIN, detener)
+
+
+def _preprocesar(entrada: queue.Queue, salida: queue.Queue,
+                 detener: threading.Event, error: list):
+    """Etapa 2: convierte el frame BGR al tensor del clasificador, sin JPEG intermedio"""
+    try:
+        while not detener.is_set():
+            try:
+                item = entrada.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _FIN:
+                break
+            idx, timestamp, frame = item
+            tensor = None
+            if frame is not None:
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                tensor = clasificacion_transform(image)
+            if not _poner(salida, (idx, timestamp, tensor), detener):
+                break
+    except Exception as e:
+        error.append(e)
+    finally:
+        _poner(salida, _FIN, detener)
+
+
+def clasificar_video(video_path: str, paso: int = 1, batch_size: int = 16, tamano_cola: int = 64,
+                     filtro: Optional[FiltroFrames] = None) -> Iterator[Tuple[int, float, str, float]]:
+    """
+    Clasifica un video en streaming y produce (frame_index, timestamp, categoria, confianza).
+    Las etapas de decodificación, preprocesado e inferencia se comunican por colas acotadas.
+    Con `filtro`, los frames casi idénticos al último clasificado reutilizan su veredicto.
+    """
+    if paso < 1:
+        raise ValueError("paso debe ser >= 1")
+
+    frames = queue.Queue(maxsize=tamano_cola)
+    tensores = queue.Queue(maxsize=tamano_cola)
+    detener = threading.Event()
+    error = []
+
+    hilos = [
+        threading.Thread(target=_decodificar, args=(video_path, paso, frames, detener, error, filtro), daemon=True),
+        threading.Thread(target=_preprocesar, args=(frames, tensores, detener, error), daemon=True),
+    ]
+    for hilo in hilos:
+        hilo.start()
+
+    try:
+        # Etapa 3: inferencia por lotes en el hilo consumidor
+        lote = []
+        ultimo = None
+        terminado = False
+        while not terminado:
+            item = tensores.get()
+            if item is _FIN:
+                terminado = True
+            else:
+                lote.append(item)
+            if lote and (terminado or len(lote) >= batch_size):
+                predicciones = iter(inferir_lote([tensor for _, _, tensor in lote if tensor is not None]))
+                for idx, timestamp, tensor in lote:
+                    # Un frame omitido por el filtro hereda el veredicto del último clasificado
+                    if tensor is not None:
+                        pred, confianza = next(predicciones)
+                        ultimo = (clases[pred], confianza)
+                    yield (idx, timestamp, *ultimo)
+                lote = []
+        if error:
+            raise error[0]
+    finally:
+        # Si el consumidor abandona el generador, se liberan las etapas previas
+        detener.set()
+        for hilo in hilos:
+            hilo.join(timeout=1.0)
+
+
+if __name__ == "__main__":
+    import sys
+    filtro = FiltroFrames()
+    for idx, timestamp, categoria, confianza in clasificar_video(sys.argv[1], paso=int(sys.argv[2]) if len(sys.argv) > 2 else 1,
+                                                                 filtro=filtro):
+        print(f"{idx}\t{timestamp:.2f}s\t{categoria}\t{confianza:.3f}")
+    print(filtro)
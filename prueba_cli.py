@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+import cache_llava
+import pipeline_video
+import stewardbot_cli
+
+# -----------------------
+# Prueba del CLI con un video contra un Ollama simulado
+# -----------------------
+
+RESPUESTA_SIMULADA = json.dumps({
+    "accion": "defensa", "contacto": "sin contacto", "trayectoria": "el coche de delante cambia dos veces de línea",
+    "posicion": "recta", "bandera": "no", "infraccion": "cambio multiple de linea",
+})
+FPS, NUM_FRAMES = 10, 30
+
+
+class OllamaSimulado(BaseHTTPRequestHandler):
+    """Responde a /api/generate como Ollama y guarda el cuerpo de cada petición"""
+    peticiones = []
+
+    def do_POST(self):
+        OllamaSimulado.peticiones.append(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+        cuerpo = json.dumps({"model": "llava", "created_at": "2024-01-01T00:00:00Z",
+                             "response": RESPUESTA_SIMULADA, "done": True}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def crear_video(ruta, color):
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (64, 48))
+    for i in range(NUM_FRAMES):
+        frame = np.full((48, 64, 3), color, dtype=np.uint8)
+        cv2.putText(frame, str(i), (5, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        escritor.write(frame)
+    escritor.release()
+
+
+def clasificar_video_simulado(video_path, paso=1, filtro=None, **_):
+    """Todos los frames sancionables: el video produce un único incidente sin cargar el modelo"""
+    for i in range(0, NUM_FRAMES, paso):
+        yield i, i / FPS, "con_sancion", 0.95
+
+
+def ejecutar(video, *extra):
+    salida = os.path.join(temporal, "salida.jsonl")
+    stewardbot_cli.main([video, "--host", host, "-o", salida, "--keyframes", temporal,
+                         "--sanciones", os.path.abspath("sanciones.json"), *extra])
+    with open(salida, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f]
+
+
+temporal = tempfile.mkdtemp(prefix="prueba_cli_")
+# Las respuestas simuladas no deben quedar en la caché real de LLaVA
+cache_llava._cache = cache_llava.CacheDescripciones(os.path.join(temporal, "cache.sqlite"))
+pipeline_video.clasificar_video = clasificar_video_simulado
+
+ollama_simulado = ThreadingHTTPServer(("127.0.0.1", 0), OllamaSimulado)
+threading.Thread(target=ollama_simulado.serve_forever, daemon=True).start()
+host = f"http://127.0.0.1:{ollama_simulado.server_address[1]}"
+
+fallos = []
+
+# 1. --host y --estructurado llegan a la descripción de los keyframes del video
+video = os.path.join(temporal, "rojo.avi")
+crear_video(video, (0, 0, 200))
+registros = ejecutar(video, "--estructurado")
+print(f"Video: {registros}")
+if not registros or any(r["tipo"] != "incidente" for r in registros):
+    fallos.append("el video no produjo incidentes")
+elif not OllamaSimulado.peticiones or OllamaSimulado.peticiones[-1].get("format") is None:
+    fallos.append("--host/--estructurado ignorados en videos")
+elif any(r["descripcion"] is None or r["error"] is not None or r["sancion"] is None for r in registros):
+    fallos.append("descripción o sanción del incidente")
+
+# 2. Con Ollama caído el incidente se conserva con el motivo en "error"
+ollama_simulado.shutdown()
+ollama_simulado.server_close()
+video = os.path.join(temporal, "azul.avi")
+crear_video(video, (200, 0, 0))
+registros = ejecutar(video)
+print(f"Video sin Ollama: {registros}")
+if not registros or any(r["descripcion"] is not None or not r.get("error") for r in registros):
+    fallos.append("error del VLM en el registro del incidente")
+
+if fallos:
+    sys.exit(f"❌ Fallos: {', '.join(fallos)}")
+print("✅ CLI correcto")
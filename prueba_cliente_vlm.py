@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cliente_vlm import ClienteVLM
+
+# -----------------------
+# Prueba de reintentos y métricas del cliente VLM contra un Ollama simulado
+# -----------------------
+
+RESPUESTA_SIMULADA = "1. **Acción observada**: defensa"
+LATENCIA = 0.2
+
+
+class OllamaInestable(BaseHTTPRequestHandler):
+    """Responde 503 (servidor saturado) a las primeras `fallos` peticiones y luego 200"""
+    fallos = 0
+    peticiones = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with OllamaInestable.lock:
+            OllamaInestable.peticiones += 1
+            fallar = OllamaInestable.fallos > 0
+            OllamaInestable.fallos -= fallar
+        if fallar:
+            estado, contenido = 503, {"error": "server busy"}
+        else:
+            time.sleep(LATENCIA)
+            estado, contenido = 200, {"model": "llava", "created_at": "2024-01-01T00:00:00Z",
+                                      "response": RESPUESTA_SIMULADA, "done": True}
+        cuerpo = json.dumps(contenido).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def preparar(fallos):
+    OllamaInestable.fallos = fallos
+    OllamaInestable.peticiones = 0
+
+
+servidor = ThreadingHTTPServer(("127.0.0.1", 0), OllamaInestable)
+threading.Thread(target=servidor.serve_forever, daemon=True).start()
+host = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+ruta = sorted(os.path.join("pruebas", f) for f in os.listdir("pruebas") if f.lower().endswith(".jpg"))[0]
+with open(ruta, "rb") as f:
+    datos = f.read()
+
+fallos = []
+
+
+def cliente(**opciones):
+    return ClienteVLM(host=host, usar_cache=False, espera_base=0.01, **opciones)
+
+
+async def prueba_reintentos():
+    # 1. Dos 503 seguidos y después 200: la descripción llega tras dos reintentos
+    preparar(2)
+    async with cliente(reintentos=3) as vlm:
+        descripcion = await vlm.describir(datos)
+    print(f"Reintentos: {vlm.num_reintentos} - peticiones: {OllamaInestable.peticiones} - {vlm}")
+    if descripcion != RESPUESTA_SIMULADA or vlm.num_reintentos != 2 or OllamaInestable.peticiones != 3:
+        fallos.append("reintento tras 503")
+    # Solo la petición correcta cuenta en el histograma de latencias
+    if vlm.latencias.resumen()["peticiones"] != 1:
+        fallos.append("latencias de los intentos fallidos")
+
+
+async def prueba_agotados():
+    # 2. Más fallos que reintentos: la ruta se devuelve como None y cuenta como error
+    preparar(10)
+    async with cliente(reintentos=2) as vlm:
+        descripciones = await vlm.describir_rutas([ruta])
+    print(f"Reintentos agotados: {descripciones} - peticiones: {OllamaInestable.peticiones}")
+    if descripciones != [None] or vlm.errores != 1 or OllamaInestable.peticiones != 3:
+        fallos.append("reintentos agotados")
+
+
+async def prueba_espera_en_cola():
+    # 3. Con concurrencia 1 la segunda petición espera en cola: esa espera no es latencia del VLM
+    preparar(0)
+    async with cliente(concurrencia=1) as vlm:
+        await asyncio.gather(vlm.describir(datos), vlm.describir(datos))
+    latencia_max, espera_max = vlm.latencias.resumen()["max"], vlm.esperas.resumen()["max"]
+    print(f"Latencia máx: {latencia_max:.2f}s - espera en cola máx: {espera_max:.2f}s")
+    if latencia_max >= 2 * LATENCIA or espera_max < LATENCIA * 0.8:
+        fallos.append("la espera en cola se mezcla con la latencia")
+
+
+asyncio.run(prueba_reintentos())
+asyncio.run(prueba_agotados())
+asyncio.run(prueba_espera_en_cola())
+
+servidor.shutdown()
+if fallos:
+    sys.exit(f"❌ Fallos: {', '.join(fallos)}")
+print("✅ Cliente VLM correcto")
@@ -1,7 +1,7 @@
 import torch
-import torch.nn as nn
-from torchvision import transforms, models
+from torchvision import transforms
 from PIL import Image
+from modelos import cargar_checkpoint
 
 # Detectar si hay GPU disponible
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -20,12 +20,8 @@ clasificacion_transform = transforms.Compose([
 
 # Cargar el modelo entrenado
 modelo_path = "StewardBot.pth"  # Asegúrate de que este archivo existe
-modelo = models.resnet152()
-num_ftrs = modelo.fc.in_features
-modelo.fc = nn.Linear(num_ftrs, 2)
-modelo.load_state_dict(torch.load(modelo_path, map_location=device))
-modelo.to(device)  # Mover el modelo a GPU si está disponible
-modelo.eval()
+modelo, meta = cargar_checkpoint(modelo_path, device)  # La arquitectura se lee del checkpoint
+print(f"Arquitectura: {meta['arquitectura']}")
 
 # Definir las clases y mensajes personalizados
 clases = ["con_sancion", "sin_sancion"]
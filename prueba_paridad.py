@@ -0,0 +1,50 @@
+import argparse
+import sys
+import torch
+from PIL import Image
+
+from app_modelo import cargar_backend, clasificacion_transform, EXTENSIONES_BACKEND
+from utilidades_imagenes import listar_imagenes
+
+# -----------------------
+# Paridad entre el modelo FP32 y un artefacto exportado
+# -----------------------
+
+parser = argparse.ArgumentParser(description="Compara las predicciones del modelo FP32 con un modelo exportado")
+parser.add_argument("exportado", help="artefacto de exportar_modelo.py (.ts u .onnx)")
+parser.add_argument("--referencia", default="StewardBot.pth")
+parser.add_argument("--carpetas", nargs="*", default=["pruebas", "accidentes"])
+parser.add_argument("--min-concordancia", type=float, default=0.99)
+args = parser.parse_args()
+
+dispositivo = torch.device("cpu")
+referencia = cargar_backend("pytorch", args.referencia, dispositivo)
+backend = EXTENSIONES_BACKEND.get("." + args.exportado.rsplit(".", 1)[-1].lower(), "torchscript")
+exportado = cargar_backend(backend, args.exportado, dispositivo)
+
+rutas = listar_imagenes(args.carpetas)
+if not rutas:
+    sys.exit(f"No se encontraron imágenes en {', '.join(args.carpetas)}")
+
+coincidencias = 0
+max_diferencia = 0.0
+discrepancias = []
+with torch.inference_mode():
+    for ruta in rutas:
+        imagen = clasificacion_transform(Image.open(ruta).convert('RGB')).unsqueeze(0)
+        p_ref = torch.softmax(referencia(imagen), 1)
+        p_exp = torch.softmax(exportado(imagen).float(), 1)
+        max_diferencia = max(max_diferencia, (p_ref - p_exp).abs().max().item())
+        if p_ref.argmax(1).item() == p_exp.argmax(1).item():
+            coincidencias += 1
+        else:
+            discrepancias.append(ruta)
+
+concordancia = coincidencias / len(rutas)
+print(f"Imágenes: {len(rutas)} - Concordancia: {concordancia:.4f} - Máx. diferencia de probabilidad: {max_diferencia:.4f}")
+for ruta in discrepancias[:10]:
+    print(f"  Discrepancia: {ruta}")
+
+if concordancia < args.min_concordancia:
+    sys.exit(f"❌ Paridad insuficiente: {concordancia:.4f} < {args.min_concordancia}")
+print("✅ Paridad correcta")
@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+from sacarcapturas import extraer_frames_video, seleccionar_indices
+
+# -----------------------
+# Prueba de la selección de frames en modo "paso" con un video corto
+# -----------------------
+
+NUM_FRAMES_VIDEO = 25
+
+fallos = []
+
+
+def comprobar(nombre, obtenido, esperado):
+    print(f"{'✅' if obtenido == esperado else '❌'} {nombre}: {obtenido}")
+    if obtenido != esperado:
+        fallos.append(nombre)
+
+
+# 1. Sin paso explícito se reparten exactamente num_frames índices
+indices = seleccionar_indices(NUM_FRAMES_VIDEO, 25, "paso", num_frames=10)
+comprobar("25 frames con num_frames=10", len(indices), 10)
+comprobar("índices ordenados y distintos", indices == sorted(set(indices)), True)
+comprobar("video más corto que num_frames", seleccionar_indices(4, 25, "paso", num_frames=10), [0, 1, 2, 3])
+
+# 2. Con paso explícito se respeta el paso
+comprobar("paso=5", seleccionar_indices(NUM_FRAMES_VIDEO, 25, "paso", paso=5), [0, 5, 10, 15, 20])
+
+# 3. Extracción real de un video corto
+temporal = tempfile.mkdtemp(prefix="prueba_sacarcapturas_")
+video = os.path.join(temporal, "corto.avi")
+escritor = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+for i in range(NUM_FRAMES_VIDEO):
+    frame = np.full((48, 64, 3), i * 10, dtype=np.uint8)
+    escritor.write(frame)
+escritor.release()
+
+guardados = extraer_frames_video(video, 1, num_frames=10, output_dir=os.path.join(temporal, "frames"), modo="paso")
+comprobar("frames guardados del video", len(guardados), 10)
+
+if fallos:
+    sys.exit(f"❌ Fallos: {', '.join(fallos)}")
+print("✅ Selección de frames correcta")
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+from app_modelo import RepositorioSanciones
+
+# -----------------------
+# Prueba de la búsqueda de sanciones sobre respuestas del VLM
+# -----------------------
+
+repositorio = RepositorioSanciones("sanciones.json")
+# El índice de embeddings de la prueba no sustituye al del proyecto
+repositorio.indice_path = os.path.join(tempfile.mkdtemp(prefix="prueba_sanciones_"), "indice.npz")
+
+fallos = []
+
+
+def comprobar(nombre, descripcion, esperado):
+    """`esperado` es el id de la primera sanción recomendada, o None si no debe haber ninguna"""
+    resultados = repositorio.buscar(descripcion)
+    obtenido = resultados[0]["id"] if resultados else None
+    print(f"{'✅' if obtenido == esperado else '❌'} {nombre}: {[(r['id'], r['puntaje']) for r in resultados]}")
+    if obtenido != esperado:
+        fallos.append(nombre)
+
+
+# 1. Respuestas neutras o vacías: ninguna sanción
+comprobar("respuesta vacía", "", None)
+comprobar("solo las etiquetas de la plantilla", """
+    1. **Acción observada**:
+    2. **Tipo de contacto**:
+    3. **Cambios de trayectoria**:
+    4. **Posición en pista**:
+    5. **Bandera visible**:
+    6. **Posible infracción**:
+    """, None)
+comprobar("lista de opciones repetida", """
+    1. **Acción observada**: [adelantamiento/defensa/frenada/salida de pista]
+    2. **Tipo de contacto**: [lateral/frontal/trasero/sin contacto]
+    4. **Posición en pista**: [curva/recta/zona de frenado]
+    6. **Posible infracción**: [Bloqueo/Cambio múltiple de línea/Salida peligrosa/Defensa agresiva]
+    """, None)
+comprobar("plantilla sin infracción", """
+    1. **Acción observada**: frenada
+    2. **Tipo de contacto**: sin contacto
+    3. **Cambios de trayectoria**: ninguno, ambos coches mantienen su trazada
+    4. **Posición en pista**: recta
+    5. **Bandera visible**: no
+    6. **Posible infracción**: No
+    """, None)
+comprobar("texto libre sin infracción", "No se observa ninguna infracción en la imagen.", None)
+
+# 1b. El VLM descarta la infracción: ningún otro campo la reintroduce
+comprobar("JSON con infracción 'ninguna' y contacto lateral",
+          '{"infraccion": "ninguna", "contacto": "lateral", "accion": "adelantamiento"}', None)
+comprobar("'Posible infracción: No' con contacto lateral", """
+    1. **Acción observada**: adelantamiento
+    2. **Tipo de contacto**: lateral
+    6. **Posible infracción**: No
+    """, None)
+comprobar("'Posible infracción: ninguna aparente'", """
+    2. **Tipo de contacto**: frontal
+    6. **Posible infracción**: Ninguna aparente, lance de carrera
+    """, None)
+comprobar("JSON con bloqueo", '{"infraccion": "bloqueo", "contacto": "sin contacto"}', 1)
+
+# 2. Descripciones con infracción: la búsqueda semántica sigue encontrándolas
+comprobar("cambio de trayectoria", "El coche de delante hace un cambio brusco de trayectoria para bloquear", 1)
+comprobar("bandera amarilla", "Un piloto adelanta con bandera amarilla agitada en la zona", 4)
+comprobar("límites de pista", "El coche sale de la pista con las cuatro ruedas y gana ventaja", 3)
+
+if fallos:
+    sys.exit(f"❌ Fallos: {', '.join(fallos)}")
+print("✅ Búsqueda de sanciones correcta")
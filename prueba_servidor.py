@@ -0,0 +1,129 @@
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -----------------------
+# Prueba del servicio HTTP contra un Ollama simulado
+# -----------------------
+
+RESPUESTA_SIMULADA = json.dumps({
+    "accion": "defensa", "contacto": "sin contacto", "trayectoria": "el coche de delante cambia dos veces de línea",
+    "posicion": "recta", "bandera": "no", "infraccion": "cambio multiple de linea",
+})
+
+
+class OllamaSimulado(BaseHTTPRequestHandler):
+    """Responde a /api/generate como Ollama, sin modelo y con una latencia fija"""
+    peticiones = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        OllamaSimulado.peticiones += 1
+        time.sleep(0.05)
+        cuerpo = json.dumps({"model": "llava", "created_at": "2024-01-01T00:00:00Z",
+                             "response": RESPUESTA_SIMULADA, "done": True}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+ollama_simulado = ThreadingHTTPServer(("127.0.0.1", 0), OllamaSimulado)
+threading.Thread(target=ollama_simulado.serve_forever, daemon=True).start()
+# El cliente de ollama lee OLLAMA_HOST al importarse: se fija antes de importar el servicio
+os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{ollama_simulado.server_address[1]}"
+
+from servidor_stewardbot import crear_servidor  # noqa: E402
+
+servidor = crear_servidor("127.0.0.1", 0, max_lote=16, espera_ms=20, usar_cache=False)
+threading.Thread(target=servidor.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def pedir(ruta, datos=None, tipo="image/jpeg"):
+    peticion = urllib.request.Request(base + ruta, data=datos, headers={"Content-Type": tipo} if datos else {})
+    try:
+        with urllib.request.urlopen(peticion, timeout=120) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+fallos = []
+
+# 1. Salud: esperar a que termine la precarga del modelo
+for _ in range(600):
+    estado, salud = pedir("/salud")
+    if salud["estado"] != "cargando":
+        break
+    time.sleep(0.1)
+print(f"Salud: {salud}")
+if estado != 200:
+    sys.exit(f"❌ El modelo no está disponible: {salud}")
+
+# 2. Clasificación concurrente: las peticiones simultáneas deben agruparse en micro-lotes
+rutas = sorted(os.path.join("pruebas", f) for f in os.listdir("pruebas") if f.lower().endswith(".jpg"))
+imagenes = []
+for ruta in (rutas * 8)[:32]:
+    with open(ruta, "rb") as f:
+        imagenes.append(f.read())
+with ThreadPoolExecutor(16) as pool:
+    respuestas = list(pool.map(lambda datos: pedir("/clasificar", datos), imagenes))
+if any(estado != 200 or "categoria" not in r for estado, r in respuestas):
+    fallos.append("clasificación concurrente")
+_, metricas = pedir("/metricas")
+print(f"Micro-lotes: {metricas['micro_lotes']}")
+if metricas["micro_lotes"]["tamano_medio"] <= 1:
+    fallos.append("las peticiones concurrentes no se agruparon")
+
+# 3. Análisis completo con el Ollama simulado y sanción resuelta por campos
+estado, analisis = pedir("/analizar?forzar=1", imagenes[0])
+print(f"Análisis: {estado} - sanción: {analisis.get('sanciones', [{}])[0].get('metadata', {}).get('penalizacion')}")
+if estado != 200 or OllamaSimulado.peticiones != 1 or not analisis.get("sanciones"):
+    fallos.append("análisis con el VLM simulado")
+
+# 3b. Misma imagen con la respuesta en JSON (modo format): sanción resuelta por los campos
+estado, analisis = pedir("/analizar?forzar=1&estructurado=1", imagenes[1])
+print(f"Análisis estructurado: {estado} - campos: {analisis.get('campos')}")
+if estado != 200 or analisis.get("campos", {}).get("infraccion") != "cambio multiple de linea" \
+        or not analisis.get("sanciones"):
+    fallos.append("análisis estructurado")
+
+# 4. Errores: imagen inválida y ruta inexistente
+if pedir("/clasificar", b"no es una imagen")[0] != 400:
+    fallos.append("imagen inválida")
+if pedir("/nada", b"x")[0] != 404:
+    fallos.append("ruta inexistente")
+
+# 4b. Tras un 404 con cuerpo, la misma conexión keep-alive debe seguir respondiendo
+conexion = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=10)
+conexion.request("POST", "/nada", body=b"x" * 1000)
+conexion.getresponse().read()
+conexion.request("GET", "/salud")
+if conexion.getresponse().status != 200:
+    fallos.append("keep-alive tras una ruta inexistente")
+conexion.close()
+
+# 5. Con Ollama caído el fallo es del VLM (503), no de la petición (400)
+ollama_simulado.shutdown()
+ollama_simulado.server_close()
+estado, analisis = pedir("/analizar?forzar=1", imagenes[2])
+print(f"Análisis sin Ollama: {estado} - {analisis.get('error')}")
+if estado != 503:
+    fallos.append("Ollama caído")
+
+servidor.shutdown()
+if fallos:
+    sys.exit(f"❌ Fallos: {', '.join(fallos)}")
+print("✅ Servicio correcto")
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import math
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ---------------------------------------------------
+# Recuperación semántica de sanciones sobre una matriz de embeddings persistida
+# ---------------------------------------------------
+
+# Modelo local de sentence-transformers (opcional); sin él se usa TF-IDF, que no descarga nada
+EMBEDDER = os.environ.get("STEWARDBOT_EMBEDDER", "")
+
+PALABRAS_VACIAS = {
+    "de", "la", "el", "en", "y", "a", "los", "las", "del", "por", "con", "un", "una", "que", "se",
+    "al", "es", "su", "sus", "o", "no", "si", "sin", "lo", "como", "para", "mas", "muy", "otro",
+    "otra", "este", "esta", "cuando", "entre", "sobre", "tipo", "casos", "aplicable",
+}
+LONGITUD_RAIZ = 6  # truncado como stemming ligero: agresiva/agresivo/agresividad -> agresi
+
+
+def normalizar_texto(texto: str) -> str:
+    """Pasa a minúsculas y elimina tildes para comparar palabras clave"""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> List[str]:
+    palabras = re.findall(r"[a-z0-9]+", normalizar_texto(texto))
+    return [p[:LONGITUD_RAIZ] for p in palabras if len(p) > 2 and p not in PALABRAS_VACIAS]
+
+
+def texto_sancion(sancion: Dict) -> str:
+    """Texto que representa una sanción: descripción, tipo, subtipo, ejemplos y palabras clave"""
+    md = sancion["metadata"]
+    partes = [sancion["text"], md.get("tipo", ""), md.get("subtipo", "")]
+    partes += md.get("ejemplos", []) + md.get("palabras_clave", [])
+    return ". ".join(p for p in partes if p)
+
+
+class EmbedderTfidf:
+    """TF-IDF con tf sublineal y normalización L2: el producto escalar es la similitud coseno"""
+
+    nombre = "tfidf"
+
+    def __init__(self, vocabulario: List[str], idf: np.ndarray):
+        self.vocabulario = {t: i for i, t in enumerate(vocabulario)}
+        self.idf = idf.astype(np.float32)
+
+    @classmethod
+    def ajustar(cls, textos: List[str]) -> "EmbedderTfidf":
+        documentos = [set(tokenizar(t)) for t in textos]
+        vocabulario = sorted(set().union(*documentos))
+        df = np.array([sum(t in d for d in documentos) for t in vocabulario], dtype=np.float32)
+        return cls(vocabulario, np.log((1 + len(textos)) / (1 + df)) + 1)
+
+    def codificar(self, textos: List[str]) -> np.ndarray:
+        matriz = np.zeros((len(textos), len(self.vocabulario)), dtype=np.float32)
+        for fila, texto in enumerate(textos):
+            cuentas: Dict[int, int] = {}
+            for token in tokenizar(texto):
+                j = self.vocabulario.get(token)
+                if j is not None:
+                    cuentas[j] = cuentas.get(j, 0) + 1
+            for j, n in cuentas.items():
+                matriz[fila, j] = (1 + math.log(n)) * self.idf[j]
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        return matriz / np.maximum(normas, 1e-12)
+
+
+class EmbedderLocal:
+    """Modelo local de sentence-transformers (dependencia opcional)"""
+
+    def __init__(self, nombre: str):
+        from sentence_transformers import SentenceTransformer
+        self.nombre = nombre
+        self.modelo = SentenceTransformer(nombre)
+
+    def codificar(self, textos: List[str]) -> np.ndarray:
+        return self.modelo.encode(textos, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def huella_sanciones(sanciones, embedder: str) -> str:
+    contenido = json.dumps(list(sanciones), sort_keys=True, ensure_ascii=False) + "|" + embedder
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class MotorRecuperacion:
+    """
+    Embeddings de las sanciones calculados una vez y guardados en `indice_path` (.npz).
+    Una consulta es un único producto matriz-vector y un top-k con argpartition.
+    """
+
+    def __init__(self, sanciones, indice_path: Optional[str] = None, embedder: str = EMBEDDER):
+        self.sanciones = sanciones
+        textos = [texto_sancion(s) for s in sanciones]
+        huella = huella_sanciones(sanciones, embedder or "tfidf")
+
+        guardado = self._leer(indice_path, huella)
+        if embedder:
+            self.embedder = EmbedderLocal(embedder)
+            self.matriz = guardado["matriz"] if guardado is not None else self.embedder.codificar(textos)
+        elif guardado is not None:
+            self.embedder = EmbedderTfidf(list(guardado["vocabulario"]), guardado["idf"])
+            self.matriz = guardado["matriz"]
+        else:
+            self.embedder = EmbedderTfidf.ajustar(textos)
+            self.matriz = self.embedder.codificar(textos)
+
+        if guardado is None and indice_path:
+            self._guardar(indice_path, huella)
+
+    @staticmethod
+    def _leer(indice_path: Optional[str], huella: str):
+        if not indice_path or not os.path.exists(indice_path):
+            return None
+        try:
+            datos = np.load(indice_path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        return datos if str(datos["huella"]) == huella else None
+
+    def _guardar(self, indice_path: str, huella: str):
+        extra = {}
+        if isinstance(self.embedder, EmbedderTfidf):
+            extra = {"vocabulario": np.array(list(self.embedder.vocabulario)), "idf": self.embedder.idf}
+        # Escritura atómica: otro proceso puede estar leyendo el índice anterior
+        temporal = indice_path + ".tmp.npz"
+        np.savez(temporal, matriz=self.matriz, huella=np.array(huella), **extra)
+        os.replace(temporal, indice_path)
+
+    def buscar(self, consulta: str, k: int = 3, umbral: float = 0.0) -> List[tuple]:
+        """Devuelve [(índice de sanción, similitud)] de mayor a menor similitud"""
+        similitudes = self.matriz @ self.embedder.codificar([consulta])[0]
+        k = min(k, len(similitudes))
+        if k <= 0:
+            return []
+        mejores = np.argpartition(-similitudes, k - 1)[:k]
+        mejores = mejores[np.argsort(-similitudes[mejores], kind="stable")]
+        return [(int(i), float(similitudes[i])) for i in mejores if similitudes[i] > umbral]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    with open("sanciones.json") as f:
+        sanciones = json.load(f)
+    motor = MotorRecuperacion(sanciones, "sanciones_indice.npz")
+    consulta = " ".join(sys.argv[1:]) or "El coche de delante cambia de línea dos veces en la recta para defenderse"
+    inicio = time.perf_counter()
+    repeticiones = 1000
+    for _ in range(repeticiones):
+        resultados = motor.buscar(consulta)
+    print(f"Embedder: {motor.embedder.nombre} - {motor.matriz.shape[0]} sanciones x {motor.matriz.shape[1]} dimensiones "
+          f"- {(time.perf_counter() - inicio) / repeticiones * 1e6:.0f} µs por consulta")
+    for i, similitud in resultados:
+        md = sanciones[i]["metadata"]
+        print(f"{similitud:.3f}  {md['articulo']} {md['tipo']} / {md['subtipo']} -> {md['penalizacion']}")
@@ -0,0 +1,174 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+from recuperacion_sanciones import normalizar_texto
+
+# ---------------------------------------------------
+# Respuesta estructurada del VLM y correspondencia directa con las sanciones
+# ---------------------------------------------------
+
+# Campo -> (etiqueta del prompt numerado, valores admitidos o None si es texto libre)
+CAMPOS = {
+    "accion": ("Acción observada", ["adelantamiento", "defensa", "frenada", "salida de pista"]),
+    "contacto": ("Tipo de contacto", ["lateral", "frontal", "trasero", "sin contacto"]),
+    "trayectoria": ("Cambios de trayectoria", None),
+    "posicion": ("Posición en pista", ["curva", "recta", "zona de frenado"]),
+    "bandera": ("Bandera visible", ["no", "amarilla", "roja", "azul", "verde", "negra", "otra"]),
+    "infraccion": ("Posible infracción", ["bloqueo", "cambio multiple de linea", "salida peligrosa",
+                                          "defensa agresiva", "ninguna"]),
+}
+
+# Esquema para el modo `format` de Ollama: la salida queda restringida a este JSON
+ESQUEMA_RESPUESTA = {
+    "type": "object",
+    "properties": {
+        campo: ({"type": "string", "enum": valores} if valores else {"type": "string"})
+        for campo, (_, valores) in CAMPOS.items()
+    },
+    "required": list(CAMPOS),
+}
+
+PROMPT_ESTRUCTURADO = """
+    Analiza la imagen de carrera con foco en posibles infracciones reglamentarias.
+    Responde EXCLUSIVAMENTE con un objeto JSON con estas claves:
+    - "accion": adelantamiento/defensa/frenada/salida de pista
+    - "contacto": lateral/frontal/trasero/sin contacto
+    - "trayectoria": describe qué coche movió y en qué dirección
+    - "posicion": curva/recta/zona de frenado
+    - "bandera": no/amarilla/roja/azul/verde/negra/otra
+    - "infraccion": bloqueo/cambio multiple de linea/salida peligrosa/defensa agresiva/ninguna
+    """
+
+# (campo, valor canónico) -> (atributo de la sanción, valor normalizado), con el peso del indicio.
+# La posible infracción es el indicio principal; el resto la confirma o la sustituye.
+REGLAS = {
+    ("infraccion", "bloqueo"): ("subtipo", "cambio de trayectoria", 2),
+    ("infraccion", "cambio multiple de linea"): ("subtipo", "cambio de trayectoria", 2),
+    ("infraccion", "defensa agresiva"): ("tipo", "defensa de posicion", 2),
+    ("infraccion", "salida peligrosa"): ("tipo", "limites de pista", 2),
+    ("contacto", "lateral"): ("subtipo", "colision lateral", 1),
+    ("contacto", "frontal"): ("tipo", "contacto", 1),
+    ("contacto", "trasero"): ("tipo", "contacto", 1),
+    ("accion", "defensa"): ("tipo", "defensa de posicion", 1),
+    ("accion", "salida de pista"): ("tipo", "limites de pista", 1),
+    ("bandera", "amarilla"): ("subtipo", "banderas", 1),
+}
+
+# Admite "1. **Acción observada**: ..." y también "**1. Acción observada:** ...".
+# Solo espacios dentro de la línea: un campo vacío no debe tomar la línea siguiente como valor.
+_PATRON_CAMPO = re.compile(
+    r"^[ \t]*\**[ \t]*\d+\.[ \t]*\**[ \t]*(" + "|".join(re.escape(normalizar_texto(e)) for e, _ in CAMPOS.values())
+    + r")[ \t]*\**[ \t]*:[ \t]*\**[ \t]*(.*)$",
+    re.MULTILINE,
+)
+_CAMPO_POR_ETIQUETA = {normalizar_texto(etiqueta): campo for campo, (etiqueta, _) in CAMPOS.items()}
+# Respuesta negativa por campo: "No", "ninguna aparente", "no se aprecia bloqueo"...
+NEGATIVOS = {"infraccion": "ninguna", "bandera": "no", "contacto": "sin contacto"}
+_PATRON_NEGATIVO = re.compile(r"(no|ningun[oa]?|nada|sin)\b")
+
+
+def canonizar(campo: str, valor: str) -> Optional[str]:
+    """
+    Lleva un valor libre ("[Bloqueo]", "sí, amarilla", "No") al valor admitido del campo.
+    Un valor ambiguo (la lista de opciones del prompt copiada, "a/b", o que nombra
+    más de una opción) se considera no respondido y devuelve None.
+    """
+    texto = normalizar_texto(str(valor)).strip(" []*.\"'")
+    valores = CAMPOS[campo][1]
+    if valores is None:
+        return texto or None
+    if texto in valores:
+        return texto
+    if "/" in texto:
+        return None
+    # La negación manda: "no se aprecia bloqueo" es "ninguna", no "bloqueo"
+    if campo in NEGATIVOS and _PATRON_NEGATIVO.match(texto):
+        return NEGATIVOS[campo]
+    presentes = [admitido for admitido in valores if admitido != "no" and admitido in texto]
+    # Una opción contenida en otra presente no cuenta aparte
+    presentes = [a for a in presentes if not any(a != b and a in b for b in presentes)]
+    if len(presentes) == 1:
+        return presentes[0]
+    return None
+
+
+def _json_crudo(texto: str) -> Dict:
+    """Campos reconocidos del JSON del modo `format` (también dentro de un bloque ```json)"""
+    bloque = re.search(r"\{.*\}", texto, re.DOTALL)
+    if bloque:
+        try:
+            return {k: v for k, v in json.loads(bloque.group(0)).items() if k in CAMPOS}
+        except (ValueError, AttributeError):
+            pass
+    return {}
+
+
+def parsear_respuesta(texto: str) -> Dict[str, str]:
+    """
+    Convierte la respuesta del VLM en campos tipados. Acepta el JSON del modo `format`
+    (también dentro de un bloque ```json) y el formato numerado de PROMPT_ANALISIS.
+    Solo se devuelven los campos reconocidos.
+    """
+    crudo = _json_crudo(texto)
+    if not crudo:
+        for etiqueta, valor in _PATRON_CAMPO.findall(normalizar_texto(texto)):
+            crudo[_CAMPO_POR_ETIQUETA[etiqueta]] = valor
+
+    campos = {}
+    for campo, valor in crudo.items():
+        canonico = canonizar(campo, valor)
+        if canonico is not None:
+            campos[campo] = canonico
+    return campos
+
+
+def _es_texto_libre(campo: str, valor) -> bool:
+    """Un valor que no está ya resuelto por los campos: texto libre o respuesta fuera de las opciones"""
+    valor = str(valor)
+    if "/" in valor:  # lista de opciones repetida
+        return False
+    return CAMPOS[campo][1] is None or canonizar(campo, valor) is None
+
+
+def texto_libre(texto: str) -> str:
+    """
+    Lo que debe comparar la búsqueda semántica: la respuesta sin las etiquetas de la
+    plantilla (por sí solas se parecen a varias sanciones), sin los valores que ya
+    resuelven los campos y sin las listas de opciones repetidas por el modelo.
+    """
+    crudo = _json_crudo(texto)
+    if crudo:
+        return ". ".join(str(v) for campo, v in crudo.items() if _es_texto_libre(campo, v))
+    return _PATRON_CAMPO.sub(
+        lambda m: m.group(2) if _es_texto_libre(_CAMPO_POR_ETIQUETA[m.group(1)], m.group(2)) else "",
+        normalizar_texto(texto),
+    )
+
+
+class IndiceSanciones:
+    """Sanciones indexadas por tipo y subtipo normalizados para resolverlas con búsquedas en dict"""
+
+    def __init__(self, sanciones):
+        self.por_atributo: Dict[tuple, List[int]] = {}
+        for i, sancion in enumerate(sanciones):
+            md = sancion["metadata"]
+            for atributo in ("tipo", "subtipo"):
+                self.por_atributo.setdefault((atributo, normalizar_texto(md[atributo])), []).append(i)
+
+    def buscar(self, campos: Dict[str, str]) -> List[tuple]:
+        """
+        [(índice de sanción, puntaje)] a partir de los campos; vacío si ningún campo
+        aplica o si el VLM descarta expresamente la infracción.
+        """
+        if campos.get("infraccion") == "ninguna":
+            return []
+        votos: Dict[int, int] = {}
+        for campo, valor in campos.items():
+            regla = REGLAS.get((campo, valor))
+            if regla is None:
+                continue
+            atributo, objetivo, peso = regla
+            for i in self.por_atributo.get((atributo, objetivo), []):
+                votos[i] = votos.get(i, 0) + peso
+        return sorted(votos.items(), key=lambda x: (-x[1], x[0]))
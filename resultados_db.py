@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cache_llava import hash_bytes
+
+# ---------------------------------------------------
+# Base de resultados para lotes reanudables, indexada por el hash de cada frame
+# ---------------------------------------------------
+
+RESULTADOS_PATH = "resultados.sqlite"
+
+
+def hash_archivo(path: str, bloque: int = 1 << 20) -> str:
+    """SHA-256 del contenido leído por bloques (sirve también para checkpoints grandes)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def huella_checkpoint(path: str) -> str:
+    """Identifica la versión del clasificador: si cambia, los veredictos se recalculan"""
+    return hash_archivo(path)[:16] if os.path.exists(path) else os.path.basename(path)
+
+
+def hash_frame(path: str) -> str:
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+
+class BaseResultados:
+    """
+    Un registro por frame (hash del contenido): clasificación, descripción,
+    sanción y tiempos. Cada resultado se confirma en cuanto se obtiene, así que
+    un lote interrumpido se reanuda sin repetir el trabajo hecho.
+    """
+
+    def __init__(self, path: str = RESULTADOS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                hash TEXT PRIMARY KEY,
+                ruta TEXT NOT NULL,
+                checkpoint TEXT,
+                categoria TEXT,
+                confianza REAL,
+                descripcion TEXT,
+                sancion TEXT,
+                t_clasificacion REAL,
+                t_descripcion REAL,
+                actualizado REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def pendientes(self, hashes: Dict[str, str], checkpoint: str, con_vlm: bool) -> Tuple[List[str], List[str]]:
+        """
+        Devuelve (rutas a clasificar, rutas a describir). Se reclasifica lo que no existe
+        o se clasificó con otro checkpoint; se describe lo sancionable aún sin descripción.
+        """
+        with self._lock:
+            filas = {}
+            claves = list(set(hashes.values()))
+            for i in range(0, len(claves), 500):
+                parte = claves[i:i + 500]
+                consulta = "SELECT hash, checkpoint, categoria, descripcion FROM resultados WHERE hash IN (%s)"
+                for fila in self._conn.execute(consulta % ",".join("?" * len(parte)), parte):
+                    filas[fila[0]] = fila
+        por_clasificar, por_describir = [], []
+        for ruta, h in hashes.items():
+            fila = filas.get(h)
+            if fila is None or fila[1] != checkpoint:
+                por_clasificar.append(ruta)
+            elif con_vlm and fila[2] == "con_sancion" and fila[3] is None:
+                por_describir.append(ruta)
+        return por_clasificar, por_describir
+
+    def guardar_clasificaciones(self, registros: List[Tuple[str, str, str, str, float, float]]):
+        """[(hash, ruta, checkpoint, categoria, confianza, segundos)]; la descripción previa se conserva"""
+        ahora = time.time()
+        with self._lock:
+            self._conn.executemany("""
+                INSERT INTO resultados (hash, ruta, checkpoint, categoria, confianza, t_clasificacion, actualizado)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(hash) DO UPDATE SET ruta=excluded.ruta, checkpoint=excluded.checkpoint,
+                    categoria=excluded.categoria, confianza=excluded.confianza,
+                    t_clasificacion=excluded.t_clasificacion, actualizado=excluded.actualizado
+            """, [(*r, ahora) for r in registros])
+            self._conn.commit()
+
+    def guardar_descripcion(self, h: str, descripcion: str, sancion: Optional[Dict], segundos: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE resultados SET descripcion=?, sancion=?, t_descripcion=?, actualizado=? WHERE hash=?",
+                (descripcion, json.dumps(sancion, ensure_ascii=False) if sancion else None,
+                 segundos, time.time(), h)
+            )
+            self._conn.commit()
+
+    def obtener(self, h: str) -> Optional[Dict]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM resultados WHERE hash=?", (h,))
+            fila = cursor.fetchone()
+            columnas = [c[0] for c in cursor.description]
+        if fila is None:
+            return None
+        registro = dict(zip(columnas, fila))
+        registro["sancion"] = json.loads(registro["sancion"]) if registro["sancion"] else None
+        return registro
+
+    def estadisticas(self, checkpoint: Optional[str] = None) -> Dict:
+        with self._lock:
+            total, sancionables, descritos = self._conn.execute(
+                "SELECT COUNT(*), SUM(categoria = 'con_sancion'), SUM(descripcion IS NOT NULL) FROM resultados"
+            ).fetchone()
+            vigentes = self._conn.execute(
+                "SELECT COUNT(*) FROM resultados WHERE checkpoint=?", (checkpoint,)
+            ).fetchone()[0] if checkpoint else total
+        return {"frames": total, "con_sancion": sancionables or 0, "descritos": descritos or 0,
+                "checkpoint_vigente": vigentes}
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    base = BaseResultados(sys.argv[1] if len(sys.argv) > 1 else RESULTADOS_PATH)
+    print(base.estadisticas())
@@ -1,69 +1,142 @@
 import cv2
 import random
 import os
+from concurrent.futures import ProcessPoolExecutor
+from filtro_frames import FiltroFrames
 
-def extraer_frames_video(video_path, video_index, num_frames=10, output_dir="frames"):
+MODOS_SELECCION = ("aleatorio", "paso", "timestamps")
+
+def seleccionar_indices(total_frames, fps, modo="aleatorio", num_frames=10, paso=None, timestamps=None):
+    """
+    Devuelve la lista ordenada de índices de frame a extraer según el modo:
+    - "aleatorio": num_frames índices al azar.
+    - "paso": un frame cada `paso` frames (si no se indica, se reparte num_frames uniformemente).
+    - "timestamps": un frame por cada instante (en segundos) de la lista `timestamps`.
+    """
+    if modo == "aleatorio":
+        return sorted(random.sample(range(total_frames), min(num_frames, total_frames)))
+    if modo == "paso":
+        if paso is None:
+            # Exactamente num_frames índices repartidos: con un paso entero 25 frames darían 13
+            n = min(max(1, num_frames), total_frames)
+            return [i * total_frames // n for i in range(n)]
+        return list(range(0, total_frames, paso))
+    if modo == "timestamps":
+        if not fps:
+            raise ValueError("El video no informa FPS; no se pueden usar timestamps.")
+        indices = {int(round(t * fps)) for t in (timestamps or [])}
+        return sorted(i for i in indices if 0 <= i < total_frames)
+    raise ValueError(f"Modo de selección desconocido: {modo}. Opciones: {', '.join(MODOS_SELECCION)}")
+
+def _leer_secuencial(cap, indices):
+    """
+    Recorre el video una sola vez: grab() para los frames descartados y
+    retrieve() solo para los seleccionados, evitando un seek por frame.
+    """
+    pendientes = iter(indices)
+    siguiente = next(pendientes, None)
+    idx = 0
+    while siguiente is not None:
+        if not cap.grab():
+            return
+        if idx == siguiente:
+            ret, frame = cap.retrieve()
+            yield idx, (frame if ret else None)
+            siguiente = next(pendientes, None)
+        idx += 1
+
+def _leer_con_seek(cap, indices):
+    """Posiciona el video en cada índice (lento en H.264, se conserva por compatibilidad)"""
+    for idx in indices:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ret, frame = cap.read()
+        yield idx, (frame if ret else None)
+
+def extraer_frames_video(video_path, video_index, num_frames=10, output_dir="frames",
+                         modo="aleatorio", paso=None, timestamps=None, secuencial=True,
+                         filtro_duplicados=None):
     """
-    Extrae num_frames aleatorios de un video y los guarda en output_dir.
+    Extrae frames de un video según el modo de selección y los guarda en output_dir.
     El nombre de cada imagen será: videox_framey.jpg, donde x es el índice del video y y el número del frame.
+    Con filtro_duplicados (bits de dHash), no se guardan frames casi idénticos al último guardado.
+    Devuelve la lista de rutas guardadas.
     """
     # Crear carpeta de salida si no existe
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
+    os.makedirs(output_dir, exist_ok=True)
+
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: No se pudo abrir el video {video_path}")
-        return
-    
+        return []
+
     # Obtener el número total de frames del video
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     if total_frames == 0:
         print(f"Error: El video {video_path} no contiene frames.")
-        return
+        cap.release()
+        return []
 
     # Si el video tiene menos frames de los que queremos extraer, se ajusta el número
-    if total_frames < num_frames:
+    if modo == "aleatorio" and total_frames < num_frames:
         print(f"El video {video_path} solo tiene {total_frames} frames. Se extraerán todos.")
         num_frames = total_frames
 
-    # Seleccionar índices aleatorios y ordenarlos
-    indices_aleatorios = sorted(random.sample(range(total_frames), num_frames))
-    
+    indices = seleccionar_indices(total_frames, cap.get(cv2.CAP_PROP_FPS), modo,
+                                  num_frames, paso, timestamps)
+    lector = _leer_secuencial if secuencial else _leer_con_seek
+    filtro = FiltroFrames("dhash", filtro_duplicados) if filtro_duplicados is not None else None
+
+    guardados = []
     frame_counter = 1
-    for idx in indices_aleatorios:
-        # Posicionar el video en el frame deseado
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-        if not ret:
+    for idx, frame in lector(cap, indices):
+        if frame is None:
             print(f"No se pudo leer el frame en el índice {idx} del video {video_path}.")
             continue
+        if filtro is not None and not filtro.debe_clasificar(frame):
+            continue
 
         # Nombre de la imagen: videox_framey.jpg
         filename = f"video{video_index}_frame{frame_counter}.jpg"
         output_path = os.path.join(output_dir, filename)
         cv2.imwrite(output_path, frame)
         print(f"Guardado {output_path}")
+        guardados.append(output_path)
         frame_counter += 1
-    
+
     cap.release()
+    if filtro is not None:
+        print(f"{video_path}: {filtro}")
+    return guardados
 
-def extraer_frames_de_carpeta(folder_path, num_frames=20, output_dir="frames"):
+def extraer_frames_de_carpeta(folder_path, num_frames=20, output_dir="frames", procesos=None, **opciones):
     """
     Recorre la carpeta especificada, busca archivos .mp4 y extrae num_frames de cada uno.
+    Los videos se procesan en paralelo con un pool de procesos (procesos=1 para hacerlo en serie).
+    Las opciones adicionales (modo, paso, timestamps, secuencial, filtro_duplicados) se pasan a extraer_frames_video.
     """
     # Listar archivos que terminen con .mp4 (sin distinguir mayúsculas y minúsculas)
-    archivos = [f for f in os.listdir(folder_path) if f.lower().endswith(".mp4")]
+    archivos = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(".mp4"))
     if not archivos:
         print("No se encontraron archivos .mp4 en la carpeta.")
-        return
-
-    video_index = 1
-    for archivo in archivos:
-        video_path = os.path.join(folder_path, archivo)
-        print(f"\nProcesando {video_path}...")
-        extraer_frames_video(video_path, video_index, num_frames, output_dir)
-        video_index += 1
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    rutas = [os.path.join(folder_path, archivo) for archivo in archivos]
+
+    if procesos == 1:
+        guardados = []
+        for video_index, video_path in enumerate(rutas, start=1):
+            print(f"\nProcesando {video_path}...")
+            guardados.extend(extraer_frames_video(video_path, video_index, num_frames, output_dir, **opciones))
+        return guardados
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = []
+        for video_index, video_path in enumerate(rutas, start=1):
+            print(f"\nProcesando {video_path}...")
+            futuros.append(pool.submit(extraer_frames_video, video_path, video_index,
+                                       num_frames, output_dir, **opciones))
+        return [ruta for futuro in futuros for ruta in futuro.result()]
 
 if __name__ == "__main__":
     folder_path = input("Ingresa la ruta de la carpeta: ")
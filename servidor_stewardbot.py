@@ -0,0 +1,243 @@
+import argparse
+import base64
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import ollama
+from PIL import Image, UnidentifiedImageError
+
+from app_modelo import (analizar_bytes, analizar_bytes_estructurado, backend, clases, clasificacion_transform, device, inferir_lote,
+                        mensajes, obtener_repositorio, precargar_modelo)
+from cliente_vlm import Histograma, HistogramaLatencias
+
+# ---------------------------------------------------
+# Servicio HTTP local: un único modelo en memoria y micro-lotes entre peticiones
+# ---------------------------------------------------
+
+
+class MicroLotes:
+    """
+    Agrupa las clasificaciones que llegan a la vez desde varios hilos en un solo
+    lote: espera como mucho `espera_ms` desde la primera petición o hasta `max_lote`.
+    """
+
+    def __init__(self, max_lote: int = 32, espera_ms: float = 5.0):
+        self.max_lote = max_lote
+        self.espera = espera_ms / 1000.0
+        self._cola: queue.Queue = queue.Queue()
+        self.lotes = 0
+        self.imagenes = 0
+        self.tamanos = Histograma(limites=(1, 2, 4, 8, 16, 32, 64))  # imágenes por lote, sin unidad
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def clasificar(self, tensor) -> Future:
+        futuro = Future()
+        self._cola.put((tensor, futuro))
+        return futuro
+
+    def _bucle(self):
+        while True:
+            pendientes = [self._cola.get()]
+            limite = time.perf_counter() + self.espera
+            while len(pendientes) < self.max_lote:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    pendientes.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                predicciones = inferir_lote([tensor for tensor, _ in pendientes])
+            except Exception as e:
+                for _, futuro in pendientes:
+                    futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.imagenes += len(pendientes)
+            self.tamanos.registrar(len(pendientes))
+            for (_, futuro), (pred, confianza) in zip(pendientes, predicciones):
+                futuro.set_result((clases[pred], confianza))
+
+
+class ServicioStewardBot:
+    """Clasificación, descripción y sanción sobre imágenes recibidas en memoria"""
+
+    def __init__(self, max_lote: int = 32, espera_ms: float = 5.0, usar_cache: bool = True,
+                 sanciones: str = "sanciones.json"):
+        self.micro_lotes = MicroLotes(max_lote, espera_ms)
+        self.usar_cache = usar_cache
+        self.repositorio = obtener_repositorio(sanciones)
+        self.inicio = time.time()
+        self.latencias: Dict[str, HistogramaLatencias] = {}
+        self.errores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.carga = precargar_modelo()
+
+    def registrar(self, ruta: str, segundos: float, error: bool = False):
+        with self._lock:
+            if ruta not in self.latencias:
+                self.latencias[ruta] = HistogramaLatencias(limites=(0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120))
+            self.latencias[ruta].registrar(segundos)
+            if error:
+                self.errores[ruta] = self.errores.get(ruta, 0) + 1
+
+    def clasificar(self, datos: bytes) -> Dict:
+        # La decodificación ocurre en el hilo de la petición; solo la inferencia se agrupa
+        tensor = clasificacion_transform(Image.open(io.BytesIO(datos)).convert("RGB"))
+        categoria, confianza = self.micro_lotes.clasificar(tensor).result()
+        return {"categoria": categoria, "mensaje": mensajes[categoria], "confianza": confianza}
+
+    def analizar(self, datos: bytes, forzar: bool = False, estructurado: bool = False) -> Dict:
+        """
+        Clasifica y, si es sancionable (o se fuerza), describe con LLaVA y busca la sanción.
+        Con `estructurado` la respuesta llega en JSON y la sanción se resuelve por sus campos.
+        """
+        resultado = self.clasificar(datos)
+        if forzar or resultado["categoria"] == "con_sancion":
+            if estructurado:
+                resultado["campos"] = analizar_bytes_estructurado(datos, self.usar_cache)
+                resultado["sanciones"] = self.repositorio.buscar_campos(resultado["campos"])
+            else:
+                resultado["descripcion"] = analizar_bytes(datos, self.usar_cache)
+                resultado["sanciones"] = self.repositorio.buscar(resultado["descripcion"])
+        return resultado
+
+    def salud(self) -> Dict:
+        cargado = not self.carga.is_alive() and getattr(self.carga, "error", None) is None
+        return {
+            "estado": "ok" if cargado else ("error" if getattr(self.carga, "error", None) else "cargando"),
+            "modelo_cargado": cargado,
+            "backend": backend,
+            "dispositivo": str(device),
+            "uptime": round(time.time() - self.inicio, 1),
+        }
+
+    def metricas(self) -> Dict:
+        with self._lock:
+            rutas = {ruta: h.resumen() for ruta, h in self.latencias.items()}
+            errores = dict(self.errores)
+        lotes = self.micro_lotes
+        return {
+            "rutas": rutas,
+            "errores": errores,
+            "micro_lotes": {
+                "lotes": lotes.lotes,
+                "imagenes": lotes.imagenes,
+                "tamano_medio": lotes.imagenes / lotes.lotes if lotes.lotes else 0.0,
+                "tamanos": lotes.tamanos.resumen()["cubetas"],
+            },
+        }
+
+
+def leer_imagen(handler: BaseHTTPRequestHandler) -> bytes:
+    """Acepta la imagen como cuerpo binario o como JSON {"imagen": base64}"""
+    cuerpo = handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+    if handler.headers.get("Content-Type", "").startswith("application/json"):
+        return base64.b64decode(json.loads(cuerpo)["imagen"])
+    return cuerpo
+
+
+def estado_error(error: Exception) -> int:
+    """
+    Código HTTP de un fallo: 400 si la petición es inválida, 503 si Ollama no
+    responde, 502 si responde con error y 500 para el resto.
+    """
+    if isinstance(error, (UnidentifiedImageError, ValueError, KeyError)):
+        return 400
+    if isinstance(error, (ConnectionError, httpx.TransportError)):
+        return 503
+    if isinstance(error, ollama.ResponseError):
+        return 502
+    return 500
+
+
+def crear_handler(servicio: ServicioStewardBot):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive para los puestos que envían muchos frames
+
+        def _responder(self, estado: int, contenido):
+            cuerpo = json.dumps(contenido, ensure_ascii=False).encode("utf-8")
+            self.send_response(estado)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self):
+            ruta = urlparse(self.path).path
+            if ruta == "/salud":
+                salud = servicio.salud()
+                self._responder(200 if salud["estado"] == "ok" else 503, salud)
+            elif ruta == "/metricas":
+                self._responder(200, servicio.metricas())
+            else:
+                self._responder(404, {"error": f"Ruta desconocida: {ruta}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            inicio = time.perf_counter()
+            error = False
+            try:
+                if url.path == "/clasificar":
+                    self._responder(200, servicio.clasificar(leer_imagen(self)))
+                elif url.path == "/analizar":
+                    consulta = parse_qs(url.query)
+                    forzar = consulta.get("forzar", ["0"])[0] in ("1", "true")
+                    estructurado = consulta.get("estructurado", ["0"])[0] in ("1", "true")
+                    self._responder(200, servicio.analizar(leer_imagen(self), forzar, estructurado))
+                elif url.path == "/sanciones":
+                    cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    self._responder(200, servicio.repositorio.buscar(cuerpo["descripcion"]))
+                else:
+                    # Se consume el cuerpo para que la conexión keep-alive siga utilizable
+                    self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    self._responder(404, {"error": f"Ruta desconocida: {url.path}"})
+                    return
+            except Exception as e:
+                error = True
+                self._responder(estado_error(e), {"error": str(e)})
+            servicio.registrar(url.path, time.perf_counter() - inicio, error)
+
+        def log_message(self, formato, *args):
+            pass  # las métricas sustituyen al log por petición
+
+    return Handler
+
+
+def crear_servidor(host: str = "127.0.0.1", puerto: int = 8765, **opciones) -> ThreadingHTTPServer:
+    servicio = ServicioStewardBot(**opciones)
+    servidor = ThreadingHTTPServer((host, puerto), crear_handler(servicio))
+    servidor.daemon_threads = True
+    servidor.servicio = servicio
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de StewardBot con micro-lotes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--max-lote", type=int, default=32)
+    parser.add_argument("--espera-ms", type=float, default=5.0, help="presupuesto de latencia para formar un lote")
+    parser.add_argument("--sin-cache", dest="usar_cache", action="store_false")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.host, args.puerto, max_lote=args.max_lote, espera_ms=args.espera_ms,
+                              usar_cache=args.usar_cache)
+    print(f"StewardBot escuchando en http://{args.host}:{args.puerto} "
+          f"(POST /clasificar, /analizar, /sanciones - GET /salud, /metricas)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utilidades_imagenes import es_imagen
+
+# ---------------------------------------------------
+# CLI sin interfaz: clasificación -> descripción -> sanción sobre carpetas y videos
+# ---------------------------------------------------
+
+EXTENSIONES_VIDEO = (".mp4", ".avi", ".mov", ".mkv")
+
+
+def expandir_entradas(entradas: List[str]) -> Tuple[List[str], List[str]]:
+    """Separa en (imágenes, videos) las rutas, carpetas (recursivo) y patrones glob indicados"""
+    imagenes, videos = [], []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas = []
+            for raiz, subcarpetas, archivos in os.walk(entrada):
+                subcarpetas.sort()
+                rutas.extend(os.path.join(raiz, f) for f in sorted(archivos))
+        elif os.path.exists(entrada):
+            rutas = [entrada]
+        else:
+            rutas = sorted(glob.glob(entrada, recursive=True))
+            if not rutas:
+                print(f"⚠️ No se encontró nada para '{entrada}'", file=sys.stderr)
+        for ruta in rutas:
+            if es_imagen(ruta):
+                imagenes.append(ruta)
+            elif os.path.splitext(ruta)[1].lower() in EXTENSIONES_VIDEO:
+                videos.append(ruta)
+    # Sin duplicados si una imagen entra por una carpeta y por un glob a la vez
+    return list(dict.fromkeys(imagenes)), list(dict.fromkeys(videos))
+
+
+def resumen_sancion(resultados: List[Dict]) -> Optional[Dict]:
+    if not resultados:
+        return None
+    mejor = resultados[0]
+    md = mejor["metadata"]
+    return {"id": mejor["id"], "articulo": md["articulo"], "tipo": md["tipo"], "gravedad": md["gravedad"],
+            "penalizacion": md["penalizacion"], "puntaje": mejor.get("puntaje")}
+
+
+def registro_error(ruta: str, error: str) -> Dict:
+    """Registro de una imagen que no se pudo procesar: el lote sigue con las demás"""
+    return {"fuente": ruta, "tipo": "imagen", "categoria": None, "confianza": None,
+            "descripcion": None, "sancion": None, "error": error}
+
+
+ERROR_DESCRIPCION = "No se pudo generar la descripción"
+
+
+def opciones_vlm(args) -> Dict:
+    """Opciones de ClienteVLM; con --estructurado la respuesta es el JSON de respuesta_vlm"""
+    opciones = {"host": args.host, "concurrencia": args.concurrencia_vlm}
+    if args.estructurado:
+        from respuesta_vlm import ESQUEMA_RESPUESTA, PROMPT_ESTRUCTURADO
+        opciones.update(prompt=PROMPT_ESTRUCTURADO, formato=ESQUEMA_RESPUESTA)
+    return opciones
+
+
+def procesar_imagenes(rutas: List[str], args) -> Iterator[Dict]:
+    """Clasifica por lotes; solo las imágenes con_sancion pasan al VLM, en paralelo"""
+    from app_modelo import clasificar_imagenes, obtener_repositorio
+    from cliente_vlm import describir_imagenes
+
+    if args.db:
+        yield from procesar_imagenes_reanudable(rutas, args)
+        return
+
+    repositorio = obtener_repositorio(args.sanciones)
+    # Bloques acotados: los resultados se escriben a medida que se completan
+    for inicio in range(0, len(rutas), args.bloque):
+        # Una imagen corrupta produce un registro con "error" en lugar de abortar el lote
+        bloque = clasificar_imagenes(rutas[inicio:inicio + args.bloque], args.batch_size, args.workers,
+                                     omitir_errores=True)
+        sancionables = [r for r in bloque if r["categoria"] == "con_sancion"]
+        if args.vlm and sancionables:
+            descripciones = describir_imagenes([r["ruta"] for r in sancionables], **opciones_vlm(args))
+            for resultado, descripcion in zip(sancionables, descripciones):
+                resultado["descripcion"] = descripcion
+                if descripcion is None:
+                    resultado["error"] = ERROR_DESCRIPCION
+                else:
+                    resultado["sancion"] = resumen_sancion(repositorio.buscar(descripcion))
+        for resultado in bloque:
+            yield {
+                "fuente": resultado["ruta"],
+                "tipo": "imagen",
+                "categoria": resultado["categoria"],
+                "confianza": round(resultado["confianza"], 4) if resultado["confianza"] is not None else None,
+                "descripcion": resultado.get("descripcion"),
+                "sancion": resultado.get("sancion"),
+                "error": resultado.get("error"),
+            }
+
+
+def procesar_imagenes_reanudable(rutas: List[str], args) -> Iterator[Dict]:
+    """
+    Igual que procesar_imagenes, pero cada resultado se guarda en la base (--db) en
+    cuanto se obtiene: al relanzar se omite lo ya hecho y, si cambia el checkpoint del
+    clasificador, solo se reclasifica (las descripciones del VLM se conservan).
+    """
+    from app_modelo import clasificar_imagenes, modelo_path, obtener_repositorio
+    from cliente_vlm import describir_imagenes
+    from resultados_db import BaseResultados, hash_frame, huella_checkpoint
+
+    repositorio = obtener_repositorio(args.sanciones)
+    base = BaseResultados(args.db)
+    checkpoint = huella_checkpoint(modelo_path)
+    reutilizados = 0
+    try:
+        for inicio in range(0, len(rutas), args.bloque):
+            bloque = rutas[inicio:inicio + args.bloque]
+            # Los fallos no se guardan en la base: se reintentan al relanzar sin detener el lote
+            errores: Dict[str, str] = {}
+            hashes = {}
+            for ruta in bloque:
+                try:
+                    hashes[ruta] = hash_frame(ruta)
+                except OSError as e:
+                    errores[ruta] = f"{type(e).__name__}: {e}"
+            por_clasificar, _ = base.pendientes(hashes, checkpoint, args.vlm)
+            reutilizados += len(hashes) - len(por_clasificar)
+
+            if por_clasificar:
+                t0 = time.perf_counter()
+                clasificados = clasificar_imagenes(por_clasificar, args.batch_size, args.workers,
+                                                   omitir_errores=True)
+                segundos = (time.perf_counter() - t0) / len(clasificados)
+                errores.update((r["ruta"], r["error"]) for r in clasificados if r["categoria"] is None)
+                base.guardar_clasificaciones([
+                    (hashes[r["ruta"]], r["ruta"], checkpoint, r["categoria"], r["confianza"], segundos)
+                    for r in clasificados if r["categoria"] is not None
+                ])
+
+            if args.vlm:
+                _, por_describir = base.pendientes(hashes, checkpoint, True)
+                if por_describir:
+                    def guardar(ruta, descripcion, segundos):
+                        sancion = resumen_sancion(repositorio.buscar(descripcion))
+                        base.guardar_descripcion(hashes[ruta], descripcion, sancion, segundos)
+                    descripciones = describir_imagenes(por_describir, al_terminar=guardar, **opciones_vlm(args))
+                    errores.update((ruta, ERROR_DESCRIPCION)
+                                   for ruta, descripcion in zip(por_describir, descripciones) if descripcion is None)
+
+            for ruta in bloque:
+                registro = base.obtener(hashes[ruta]) if ruta in hashes else None
+                if registro is None:
+                    yield registro_error(ruta, errores[ruta])
+                    continue
+                con_sancion = registro["categoria"] == "con_sancion"
+                yield {
+                    "fuente": ruta,
+                    "tipo": "imagen",
+                    "hash": registro["hash"],
+                    "categoria": registro["categoria"],
+                    "confianza": round(registro["confianza"], 4),
+                    "descripcion": registro["descripcion"] if con_sancion else None,
+                    "sancion": registro["sancion"] if con_sancion else None,
+                    "t_clasificacion": registro["t_clasificacion"],
+                    "t_descripcion": registro["t_descripcion"] if con_sancion else None,
+                    "error": errores.get(ruta),
+                }
+        print(f"Base de resultados: {reutilizados} clasificaciones reutilizadas - {base.estadisticas(checkpoint)}")
+    finally:
+        base.cerrar()
+
+
+def procesar_video(ruta: str, args) -> Iterator[Dict]:
+    """Un registro por incidente detectado en el video"""
+    from incidentes import detectar_incidentes
+
+    incidentes = detectar_incidentes(ruta, paso=args.paso, analizar=args.vlm, output_dir=args.keyframes,
+                                     opciones_vlm=opciones_vlm(args))
+    for incidente in incidentes:
+        yield {
+            "fuente": ruta,
+            "tipo": "incidente",
+            "categoria": "con_sancion",
+            "confianza": round(incidente["puntaje_max"], 4),
+            "inicio": round(incidente["inicio"], 3),
+            "fin": round(incidente["fin"], 3),
+            "keyframe": incidente["keyframe"],
+            "keyframe_ruta": incidente.get("keyframe_ruta"),
+            "descripcion": incidente.get("descripcion"),
+            "sancion": resumen_sancion([incidente["sancion"]] if incidente.get("sancion") else []),
+            "error": incidente.get("error"),
+        }
+
+
+class EscritorResultados:
+    """JSONL línea a línea (se puede seguir con tail -f) o Parquet al cerrar"""
+
+    def __init__(self, salida: Optional[str], formato: str):
+        self.salida = salida
+        self.formato = formato
+        self.registros: List[Dict] = []
+        self.total = 0
+        if formato == "parquet":
+            if not salida:
+                raise ValueError("El formato parquet necesita --salida")
+            self._archivo = None
+        else:
+            # Se guarda el stdout real: mientras se procesa, sys.stdout apunta a stderr.
+            # El archivo se reescribe: con --db una ejecución reanudada vuelca todo el lote
+            # desde la base, así que añadir al final duplicaría lo ya escrito.
+            self._archivo = open(salida, "w", encoding="utf-8") if salida else sys.stdout
+
+    def escribir(self, registro: Dict):
+        self.total += 1
+        if self._archivo is None:
+            self.registros.append(registro)
+            return
+        self._archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+
+    def cerrar(self):
+        if self.formato == "parquet":
+            import pandas as pd
+            # Las columnas anidadas (sanción) se guardan como texto JSON
+            filas = [{k: json.dumps(v, ensure_ascii=False) if isinstance(v, dict) else v
+                      for k, v in r.items()} for r in self.registros]
+            pd.DataFrame(filas).to_parquet(self.salida, index=False)
+        elif self.salida:
+            self._archivo.close()
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Procesa imágenes, carpetas, globs o videos: clasificación -> descripción (LLaVA) -> sanción")
+    parser.add_argument("entradas", nargs="+", help="imágenes, carpetas, patrones glob ('frames/**/*.jpg') o videos")
+    parser.add_argument("-o", "--salida", default=None,
+                        help="archivo de resultados, se reescribe en cada ejecución (por defecto JSONL por stdout)")
+    parser.add_argument("--formato", choices=["jsonl", "parquet"], default=None,
+                        help="por defecto se deduce de la extensión de --salida")
+    parser.add_argument("--sin-vlm", dest="vlm", action="store_false", help="solo clasificación, sin LLaVA")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None, help="hilos de carga y preprocesado de imágenes")
+    parser.add_argument("--bloque", type=int, default=256, help="imágenes por bloque antes de escribir resultados")
+    parser.add_argument("--concurrencia-vlm", type=int, default=2, help="peticiones simultáneas a Ollama")
+    parser.add_argument("--estructurado", action="store_true",
+                        help="pide a LLaVA la respuesta en JSON (modo format) y resuelve la sanción por sus campos")
+    parser.add_argument("--host", default=None, help="servidor de Ollama (por defecto OLLAMA_HOST o localhost)")
+    parser.add_argument("--paso", type=int, default=5, help="en videos, clasificar un frame de cada N")
+    parser.add_argument("--keyframes", default="incidentes", help="carpeta para los keyframes de los incidentes")
+    parser.add_argument("--sanciones", default="sanciones.json")
+    parser.add_argument("--db", default=None,
+                        help="base SQLite de resultados: permite reanudar el lote y reevaluar al cambiar el modelo")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    if args.formato is None:
+        args.formato = "parquet" if args.salida and args.salida.lower().endswith(".parquet") else "jsonl"
+
+    imagenes, videos = expandir_entradas(args.entradas)
+    if not imagenes and not videos:
+        sys.exit("No hay imágenes ni videos que procesar")
+    print(f"Imágenes: {len(imagenes)} - Videos: {len(videos)}", file=sys.stderr)
+
+    escritor = EscritorResultados(args.salida, args.formato)
+    inicio = time.perf_counter()
+    # Los mensajes de progreso de los módulos van a stderr para no mezclarse con el JSONL de stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if imagenes:
+                for registro in procesar_imagenes(imagenes, args):
+                    escritor.escribir(registro)
+            for video in videos:
+                print(f"Procesando {video}...")
+                for registro in procesar_video(video, args):
+                    escritor.escribir(registro)
+        finally:
+            escritor.cerrar()
+        print(f"{escritor.total} resultados en {time.perf_counter() - inicio:.1f}s"
+              + (f" -> {args.salida}" if args.salida else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import random
+from typing import Iterable, List, Optional, Union
+
+# ---------------------------------------------------
+# Listado de imágenes compartido por el entrenamiento, la exportación y las herramientas
+# ---------------------------------------------------
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def es_imagen(ruta: str) -> bool:
+    return ruta.lower().endswith(EXTENSIONES_IMAGEN)
+
+
+def listar_imagenes(carpetas: Union[str, Iterable[str]], limite: Optional[int] = None, semilla: int = 0,
+                    relativas: bool = False) -> List[str]:
+    """
+    Rutas de las imágenes bajo una o varias carpetas (recursivo, en orden estable).
+    Con `limite`, una muestra aleatoria reproducible; con `relativas`, rutas
+    relativas a su carpeta.
+    """
+    if isinstance(carpetas, str):
+        carpetas = [carpetas]
+    rutas = []
+    for carpeta in carpetas:
+        for raiz, subcarpetas, archivos in os.walk(carpeta):
+            subcarpetas.sort()
+            for f in sorted(archivos):
+                if es_imagen(f):
+                    ruta = os.path.join(raiz, f)
+                    rutas.append(os.path.relpath(ruta, carpeta) if relativas else ruta)
+    if limite is not None and len(rutas) > limite:
+        rutas = random.Random(semilla).sample(rutas, limite)
+    return rutas